@@ -6,24 +6,90 @@ Port: 8001
 """
 
 from flask import Flask, request, jsonify
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 import psycopg
-from psycopg.rows import dict_row
+from psycopg.conninfo import conninfo_to_dict, make_conninfo
+from psycopg.rows import dict_row, tuple_row
+from psycopg_pool import ConnectionPool, PoolTimeout
+import orjson
 import os
 import re
+import bisect
+import functools
 import json
+import logging
+import operator
 import uuid
 import sys
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from types import MappingProxyType
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from dotenv import load_dotenv
 
 # Load env variables including DATABASE_URL
 load_dotenv(os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env'))
 
+# Per-request diagnostics and handled errors on hot paths go through logging rather than
+# print: per-request detail at DEBUG (a no-op unless enabled), handled errors at WARNING
+log = logging.getLogger(__name__)
+
+
+def _json_default(obj):
+    """
+    JSON hook for DB-native values (NUMERIC -> Decimal, DATE/TIMESTAMP -> date).
+    Shared by the Flask provider and the ai_analysis_json column write.
+    """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (date, datetime)):
+        return obj.isoformat()
+    if isinstance(obj, (MappingProxyType, Mapping)):
+        return dict(obj)
+    if isinstance(obj, tuple):
+        return list(obj)  # NamedTuples - orjson only encodes plain tuples natively
+    return str(obj)
+
+
+# Sorted keys like Flask's default provider; non-str keys are stringified like json.dumps does
+_ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+
+def dumps_json(obj) -> str:
+    """Encode with orjson, falling back to _json_default for DB-native values"""
+    return orjson.dumps(obj, default=_json_default, option=_ORJSON_OPTIONS).decode()
+
+
+class EngineJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson that encodes DB rows without a per-row conversion pass"""
+    default = staticmethod(_json_default)
+
+    def dumps(self, obj, **kwargs) -> str:
+        # Always compact: jsonify's indent/separators arguments don't apply
+        return dumps_json(obj)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 app = Flask(__name__)
+app.json = EngineJSONProvider(app)
 CORS(app)
 
+# No-op if the server (or an embedding app) has already configured logging
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
 # Database Configuration
 # Uses explicit variables if available, falling back to DATABASE_URL
 # Database Configuration
@@ -41,6 +107,29 @@ DB_URL = os.environ.get("DATABASE_URL")
 if DB_URL:
     DB_URL = DB_URL.strip('"').strip("'")
 
+# Errors meaning the connection itself is gone (server restart, idle timeout, network blip)
+DB_RETRYABLE_ERRORS = (psycopg.OperationalError, psycopg.InterfaceError)
+
+
+def with_db_retry(fn):
+    """
+    Run a DB read once more if its connection turned out to be dead.
+    The pool discards the broken connection, so the retry gets a fresh one.
+    Only for idempotent reads - a retried write could be applied twice.
+    """
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except PoolTimeout:
+            # No free connection (or DB unreachable) - waiting again won't help this request
+            raise
+        except DB_RETRYABLE_ERRORS as e:
+            log.warning("DB connection error in %s, retrying once: %s", fn.__name__, e)
+            return fn(*args, **kwargs)
+    return wrapper
+
+
 # ============================================================
 # DEFAULT CONSTRAINT RULES DEFINITION
 # These are used as fallback when no company-specific rules exist
@@ -263,14 +352,113 @@ DEFAULT_CONSTRAINT_RULES = {
     }
 }
 
+
+def _freeze(value):
+    """Recursively wrap dicts/lists in read-only views so shared rule templates can't be mutated"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# Defaults are shared by every org without custom rules - freeze them once at import
+DEFAULT_CONSTRAINT_RULES = _freeze(DEFAULT_CONSTRAINT_RULES)
+
+_EMPTY = MappingProxyType({})
+# Stand-in for a built-in rule missing from a rules dict: active, default config
+_MISSING_RULE = MappingProxyType({"config": _EMPTY})
+
 # Active constraint rules (loaded dynamically per organization)
 # This global is used as a fallback - prefer get_org_constraint_rules() for org-specific rules
-CONSTRAINT_RULES = DEFAULT_CONSTRAINT_RULES.copy()
+CONSTRAINT_RULES = DEFAULT_CONSTRAINT_RULES
+
 
-# Cache for organization-specific rules (org_id -> rules dict)
-_org_rules_cache = {}
-_org_rules_cache_time = {}
+class RulesBundle(NamedTuple):
+    """An org's active rules plus lookup indices, built once per cache fill"""
+    by_id: Dict                                      # rule_id -> rule (what get_org_constraint_rules returns)
+    priority_sorted: Tuple[Tuple[str, Dict], ...]    # all rules, highest priority first
+    blocking_sorted: Tuple[Tuple[str, Dict], ...]    # active blocking rules, highest priority first
+    non_blocking_sorted: Tuple[Tuple[str, Dict], ...]  # active warning-only rules, highest priority first
+    eval_order: Tuple[Tuple[str, Dict], ...]         # blocking first, cheapest first, then by priority
+    checks: Tuple[Tuple[str, Callable[[str, Dict, Dict], Dict]], ...]  # eval_order resolved to check functions
+
+
+# Relative evaluation cost: 0 = in-memory (blackouts are cached), 1 = one indexed query,
+# 2 = team scan (joins every overlapping leave in the department)
+_RULE_COMPLEXITY = {
+    "RULE001": 0, "RULE005": 0, "RULE006": 0, "RULE007": 0, "RULE014": 0,
+    "RULE002": 1, "RULE013": 1,
+    "RULE003": 2, "RULE004": 2,
+}
+_CUSTOM_CATEGORY_COMPLEXITY = {"eligibility": 1, "coverage": 2}
+
+
+def rule_complexity(rule_id: str, rule: Dict) -> int:
+    """Estimated cost of evaluating a rule, used to run cheap checks first"""
+    if rule_id in _RULE_COMPLEXITY:
+        return _RULE_COMPLEXITY[rule_id]
+    return _CUSTOM_CATEGORY_COMPLEXITY.get(rule.get("category"), 0)
+
+
+def build_rules_bundle(rules: Dict) -> RulesBundle:
+    """Index a rules dict by priority and evaluation order"""
+    priority_sorted = tuple(sorted(rules.items(), key=lambda item: item[1].get("priority", 50), reverse=True))
+    active = [item for item in priority_sorted if item[1].get("is_active", True)]
+    blocking_sorted = tuple(item for item in active if item[1].get("is_blocking", True))
+    non_blocking_sorted = tuple(item for item in active if not item[1].get("is_blocking", True))
+    # sorted() is stable, so equal-cost rules keep their priority order
+    eval_order = (tuple(sorted(blocking_sorted, key=lambda item: rule_complexity(*item))) +
+                  tuple(sorted(non_blocking_sorted, key=lambda item: rule_complexity(*item))))
+    return RulesBundle(
+        by_id=rules,
+        priority_sorted=priority_sorted,
+        blocking_sorted=blocking_sorted,
+        non_blocking_sorted=non_blocking_sorted,
+        eval_order=eval_order,
+        # Resolved once per cache fill: built-in checks by id, custom rules specialized.
+        # Only rules with a built-in check or a "CUSTOM" id are evaluated.
+        checks=tuple((rule_id, BUILTIN_RULE_CHECKS.get(rule_id) or compile_custom_rule(rule_id, rule))
+                     for rule_id, rule in eval_order
+                     if rule_id in BUILTIN_RULE_CHECKS or rule_id.startswith("CUSTOM"))
+    )
+
+
+# Cache for organization-specific rules (org_id -> (expires_at, RulesBundle)),
+# expires_at in time.monotonic() seconds. Bounded LRU: least recently used orgs
+# are evicted past MAX_ORG_CACHE. Orgs without custom rules all share
+# DEFAULT_RULES_BUNDLE, so they cost one tuple each.
+_org_rules_cache: "OrderedDict[str, Tuple[float, RulesBundle]]" = OrderedDict()
+_org_rules_cache_lock = threading.Lock()
+_org_rules_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
 CACHE_TTL_SECONDS = 300  # 5 minutes cache
+# A failed load caches the defaults briefly, so callers don't all queue on the
+# refill lock and wait out the pool timeout while the database is down
+RULES_RETRY_SECONDS = 30
+MAX_ORG_CACHE = 1024
+
+# Per-org refill locks so concurrent cache misses hit the DB only once
+_org_rules_locks = {}
+_org_rules_locks_guard = threading.Lock()
+
+
+def _get_cached_org_rules(cache_key: str, now: float) -> Optional[RulesBundle]:
+    """Return cached rules for an org if present and not expired (now is time.monotonic())"""
+    with _org_rules_cache_lock:
+        entry = _org_rules_cache.get(cache_key)
+        if entry and entry[0] > now:
+            _org_rules_cache.move_to_end(cache_key)
+            return entry[1]
+    return None
+
+
+def _get_org_rules_lock(cache_key: str) -> threading.Lock:
+    """Get (or lazily create) the refill lock for an org"""
+    with _org_rules_locks_guard:
+        lock = _org_rules_locks.get(cache_key)
+        if lock is None:
+            lock = _org_rules_locks[cache_key] = threading.Lock()
+        return lock
 
 
 def get_org_constraint_rules(org_id: str) -> Dict:
@@ -279,363 +467,611 @@ def get_org_constraint_rules(org_id: str) -> Dict:
     Fetches from database if available, otherwise returns defaults.
     Uses caching to avoid repeated DB calls.
     """
-    global _org_rules_cache, _org_rules_cache_time
-    
+    return get_org_rules_bundle(org_id).by_id
+
+
+def get_org_rules_bundle(org_id: str) -> RulesBundle:
+    """Same as get_org_constraint_rules() but returns the indexed RulesBundle"""
     # Check cache first
     cache_key = org_id or "default"
-    now = datetime.now()
-    
-    if cache_key in _org_rules_cache:
-        cache_time = _org_rules_cache_time.get(cache_key)
-        if cache_time and (now - cache_time).total_seconds() < CACHE_TTL_SECONDS:
-            print(f"📦 Using cached rules for org: {cache_key}", file=sys.stderr)
-            return _org_rules_cache[cache_key]
-    
-    # Fetch from database
-    conn = get_db_connection()
-    if not conn:
-        print(f"⚠️ No DB connection, using default rules", file=sys.stderr)
-        return DEFAULT_CONSTRAINT_RULES
     
-    try:
-        cur = conn.cursor(row_factory=dict_row)
-        
+    cached = _get_cached_org_rules(cache_key, time.monotonic())
+    if cached is not None:
+        _org_rules_cache_stats["hits"] += 1
+        log.debug("Using cached rules for org: %s", cache_key)
+        return cached
+    _org_rules_cache_stats["misses"] += 1
+    _ensure_rules_listener()
+    
+    # Single-flight refill: the first thread to miss queries the DB, concurrent
+    # misses for the same org wait here and then read the entry it cached
+    with _get_org_rules_lock(cache_key):
+        now = time.monotonic()
+        cached = _get_cached_org_rules(cache_key, now)
+        if cached is not None:
+            return cached
+        return _load_org_constraint_rules(org_id, cache_key, now)
+
+
+def _build_org_rules(org_rules) -> Dict:
+    """Turn a constraint_policies.rules value into a read-only mapping of normalized active rules"""
+    # rules is a jsonb column, so psycopg already hands us a dict - no json.loads here
+    
+    # Filter to only active rules
+    active_rules = {}
+    for rule_id, rule_data in org_rules.items():
+        if rule_data.get('is_active', True):
+            # Normalize the rule structure for backwards compatibility
+            active_rules[rule_id] = normalize_rule_format(rule_id, rule_data)
+    # Shared by every request for this org until the entry expires - hand out a read-only view
+    return MappingProxyType(active_rules)
+
+
+def _cache_org_rules(cache_key: str, bundle: RulesBundle, now: float, ttl: float = CACHE_TTL_SECONDS) -> None:
+    """Store an org's indexed rules in the cache, evicting the least recently used org when full"""
+    with _org_rules_cache_lock:
+        _org_rules_cache[cache_key] = (now + ttl, bundle)
+        _org_rules_cache.move_to_end(cache_key)
+        while len(_org_rules_cache) > MAX_ORG_CACHE:
+            evicted_key, _ = _org_rules_cache.popitem(last=False)
+            _org_rules_locks.pop(evicted_key, None)
+            _org_rules_cache_stats["evictions"] += 1
+
+
+@with_db_retry
+def _fetch_org_policy(org_id: str) -> Optional[Dict]:
+    with get_db_connection() as conn, conn.cursor() as cur:
         # Query constraint_policies table for org-specific rules
         cur.execute("""
             SELECT rules FROM constraint_policies 
             WHERE org_id = %s AND is_active = true
             ORDER BY updated_at DESC LIMIT 1
         """, (org_id,))
-        
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        return cur.fetchone()
+
+
+def _load_org_constraint_rules(org_id: str, cache_key: str, now: float) -> RulesBundle:
+    """Fetch an organization's rules from the database and store them in the cache"""
+    # Fetch from database (pooled connection, released when the block exits)
+    try:
+        result = _fetch_org_policy(org_id)
         
         if result and result.get('rules'):
-            org_rules = result['rules']
-            
-            # If rules is a string (JSON), parse it
-            if isinstance(org_rules, str):
-                org_rules = json.loads(org_rules)
-            
-            # Filter to only active rules
-            active_rules = {}
-            for rule_id, rule_data in org_rules.items():
-                if rule_data.get('is_active', True):
-                    # Normalize the rule structure for backwards compatibility
-                    active_rules[rule_id] = normalize_rule_format(rule_id, rule_data)
+            bundle = build_rules_bundle(_build_org_rules(result['rules']))
             
             # Cache the result
-            _org_rules_cache[cache_key] = active_rules
-            _org_rules_cache_time[cache_key] = now
+            _cache_org_rules(cache_key, bundle, now)
             
-            print(f"✅ Loaded {len(active_rules)} active rules for org: {org_id}", file=sys.stderr)
-            return active_rules
+            log.debug("Loaded %d active rules for org: %s", len(bundle.by_id), org_id)
+            return bundle
         else:
             # No custom rules, use defaults
-            print(f"📋 No custom rules for org {org_id}, using defaults", file=sys.stderr)
-            _org_rules_cache[cache_key] = DEFAULT_CONSTRAINT_RULES
-            _org_rules_cache_time[cache_key] = now
-            return DEFAULT_CONSTRAINT_RULES
+            log.debug("No custom rules for org %s, using defaults", org_id)
+            _cache_org_rules(cache_key, DEFAULT_RULES_BUNDLE, now)
+            return DEFAULT_RULES_BUNDLE
             
     except Exception as e:
-        print(f"❌ Error fetching org rules: {e}", file=sys.stderr)
-        if conn:
-            conn.close()
-        return DEFAULT_CONSTRAINT_RULES
+        log.warning("Error fetching org rules, using default rules: %s", e)
+        _cache_org_rules(cache_key, DEFAULT_RULES_BUNDLE, now, RULES_RETRY_SECONDS)
+        # Threads already waiting hold the lock object; later misses get a fresh one
+        with _org_rules_locks_guard:
+            _org_rules_locks.pop(cache_key, None)
+        return DEFAULT_RULES_BUNDLE
+
+
+@with_db_retry
+def _fetch_org_policies(org_ids: List[str]) -> Dict:
+    with get_db_connection() as conn, conn.cursor() as cur:
+        # Latest active policy per org in one round-trip
+        cur.execute("""
+            SELECT DISTINCT ON (org_id) org_id, rules
+            FROM constraint_policies
+            WHERE org_id = ANY(%s) AND is_active = true
+            ORDER BY org_id, updated_at DESC
+        """, (org_ids,))
+        return {row['org_id']: row['rules'] for row in cur.fetchall()}
+
+
+def prefetch_org_constraint_rules(org_ids: List[str]) -> int:
+    """
+    Load rules for many organizations with a single query and populate the cache.
+    Meant for batch validators/schedulers; per-request code keeps using
+    get_org_constraint_rules() and simply finds the entries already cached.
+    Orgs without an active policy are cached with the default rules.
+    
+    Returns the number of organizations cached.
+    """
+    org_ids = [org_id for org_id in dict.fromkeys(org_ids) if org_id]
+    if not org_ids:
+        return 0
+    
+    try:
+        policies = _fetch_org_policies(org_ids)
+    except Exception as e:
+        log.warning("Error prefetching org rules: %s", e)
+        return 0
+    
+    now = time.monotonic()
+    for org_id in org_ids:
+        org_rules = policies.get(org_id)
+        _cache_org_rules(org_id, build_rules_bundle(_build_org_rules(org_rules)) if org_rules else DEFAULT_RULES_BUNDLE, now)
+    
+    _ensure_rules_listener()
+    
+    log.info("Prefetched rules for %d orgs (%d custom)", len(org_ids), len(policies))
+    return len(org_ids)
 
 
-def normalize_rule_format(rule_id: str, rule_data: Dict) -> Dict:
+def warm_org_rules_cache(org_ids: List[str] = None) -> int:
+    """
+    Preload rules so the first request for each org doesn't pay the DB round-trip.
+    With no org_ids, warms every org with an active policy (up to MAX_ORG_CACHE).
+    
+    Returns the number of organizations cached.
+    """
+    if org_ids is None:
+        try:
+            with get_db_connection() as conn, conn.cursor() as cur:
+                cur.execute("""
+                    SELECT DISTINCT org_id FROM constraint_policies
+                    WHERE is_active = true
+                    LIMIT %s
+                """, (MAX_ORG_CACHE,))
+                org_ids = [row['org_id'] for row in cur.fetchall()]
+        except Exception as e:
+            log.warning("Error listing orgs for rules cache warm-up: %s", e)
+            return 0
+    return prefetch_org_constraint_rules(org_ids)
+
+
+# Top-level keys copied into "config" for rules stored in the old flat format
+# (RULE001 limits, RULE003 coverage, RULE004 concurrency, RULE006 notice,
+#  RULE007 consecutive, RULE013 monthly quota, RULE014 escalation)
+_FLAT_CONFIG_KEYS = (
+    "limits", "min_coverage_percent", "max_concurrent", "notice_days",
+    "max_consecutive", "max_per_month", "always_escalate",
+)
+
+# Rule fields a stored rule may override on top of its template
+_RULE_OVERRIDE_FIELDS = ("name", "description", "category", "is_blocking", "priority", "is_active", "is_custom")
+
+
+@dataclass(slots=True, frozen=True)
+class Rule(Mapping):
+    """
+    A normalized org rule. Slotted and immutable, but readable like a dict
+    (rule["config"], rule.get("priority"), dict(rule)) so check functions and
+    JSON responses treat it the same as the default rule mappings.
+    """
+    id: str
+    name: str
+    description: str
+    category: str
+    is_blocking: bool
+    priority: int
+    is_active: bool
+    is_custom: bool
+    config: Mapping
+
+    def __getitem__(self, key):
+        if key not in _RULE_FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        # Mapping.get goes through __getitem__ and a try/except; checks call this on every request
+        return getattr(self, key) if key in _RULE_FIELD_SET else default
+
+    def __iter__(self):
+        return iter(_RULE_FIELDS)
+
+    def __len__(self):
+        return len(_RULE_FIELDS)
+
+
+# Field order for iteration/dict(rule); the set serves the per-lookup membership test
+_RULE_FIELDS = tuple(Rule.__dataclass_fields__)
+_RULE_FIELD_SET = frozenset(_RULE_FIELDS)
+
+
+def _rule_template(rule_id: str, default: Dict) -> Rule:
+    """Normalized rule fields before applying the stored rule's overrides"""
+    return Rule(
+        id=rule_id,
+        name=default.get("name", rule_id),
+        description=default.get("description", ""),
+        category=default.get("category", "limits"),
+        is_blocking=default.get("is_blocking", True),
+        priority=default.get("priority", 50),
+        is_active=True,
+        is_custom=False,
+        config=default.get("config", _EMPTY)
+    )
+
+
+# Templates for the built-in rules, resolved once instead of on every normalization
+_RULE_TEMPLATES = {rule_id: _rule_template(rule_id, rule) for rule_id, rule in DEFAULT_CONSTRAINT_RULES.items()}
+
+# Shared template for custom/unknown rule ids (id and name are filled in per rule)
+_CUSTOM_RULE_TEMPLATE = _rule_template("", _EMPTY)
+
+
+def _coerce_priority(value) -> int:
+    """Stored priority as an int, 50 (the default) when it isn't numeric"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 50
+
+
+def normalize_rule_format(rule_id: str, rule_data: Dict) -> Rule:
     """
     Normalize rule data format for backwards compatibility.
     Ensures config is properly structured even if stored in flat format.
     """
-    # Get default rule structure as template
-    default = DEFAULT_CONSTRAINT_RULES.get(rule_id, {})
-    
-    normalized = {
-        "id": rule_id,
-        "name": rule_data.get("name", default.get("name", rule_id)),
-        "description": rule_data.get("description", default.get("description", "")),
-        "category": rule_data.get("category", default.get("category", "limits")),
-        "is_blocking": rule_data.get("is_blocking", default.get("is_blocking", True)),
-        "priority": rule_data.get("priority", default.get("priority", 50)),
-        "is_active": rule_data.get("is_active", True),
-        "is_custom": rule_data.get("is_custom", False),
-    }
-    
-    # Handle config - might be nested or flat
+    # Start from the default rule structure as template (one hash probe; custom ids skip the defaults)
+    template = _RULE_TEMPLATES.get(rule_id)
+    if template is None:
+        template = _CUSTOM_RULE_TEMPLATE
+        overrides = {"id": rule_id, "name": rule_id}
+    else:
+        overrides = {}
+    overrides.update({key: rule_data[key] for key in _RULE_OVERRIDE_FIELDS if key in rule_data})
+    if "priority" in overrides:
+        # Stored JSON may hold "10" or junk; build_rules_bundle sorts on this, so it must be an int
+        overrides["priority"] = _coerce_priority(overrides["priority"])
+    
+    # Handle config - might be nested or flat. Every normalized rule carries a
+    # Mapping config (get_rule_config() and the checks read it unguarded)
     if "config" in rule_data:
-        normalized["config"] = rule_data["config"]
+        if isinstance(rule_data["config"], Mapping):
+            overrides["config"] = rule_data["config"]
+        else:
+            log.warning("Rule %s has a non-object config, using the default", rule_id)
     else:
         # Try to extract config from flat structure (old format compatibility)
-        config = {}
-        
-        # RULE001: limits
-        if "limits" in rule_data:
-            config["limits"] = rule_data["limits"]
-        
-        # RULE003: min_coverage_percent
-        if "min_coverage_percent" in rule_data:
-            config["min_coverage_percent"] = rule_data["min_coverage_percent"]
-        
-        # RULE004: max_concurrent
-        if "max_concurrent" in rule_data:
-            config["max_concurrent"] = rule_data["max_concurrent"]
-        
-        # RULE006: notice_days
-        if "notice_days" in rule_data:
-            config["notice_days"] = rule_data["notice_days"]
+        config = {key: rule_data[key] for key in _FLAT_CONFIG_KEYS if key in rule_data}
         
-        # RULE007: max_consecutive
-        if "max_consecutive" in rule_data:
-            config["max_consecutive"] = rule_data["max_consecutive"]
-        
-        # RULE013: max_per_month
-        if "max_per_month" in rule_data:
-            config["max_per_month"] = rule_data["max_per_month"]
-        
-        # RULE014: always_escalate
-        if "always_escalate" in rule_data:
-            config["always_escalate"] = rule_data["always_escalate"]
-        
-        # Use default config if nothing extracted
-        normalized["config"] = config if config else default.get("config", {})
+        # Otherwise keep the template's (default) config
+        if config:
+            overrides["config"] = config
     
-    return normalized
+    return replace(template, **overrides)
 
 
 def clear_org_rules_cache(org_id: str = None):
     """Clear the rules cache for an organization or all orgs"""
-    global _org_rules_cache, _org_rules_cache_time
-    if org_id:
-        _org_rules_cache.pop(org_id, None)
-        _org_rules_cache_time.pop(org_id, None)
-    else:
-        _org_rules_cache.clear()
-        _org_rules_cache_time.clear()
-    print(f"🗑️ Rules cache cleared for: {org_id or 'all'}", file=sys.stderr)
+    if not org_id:
+        log.warning("Clearing rules cache for ALL orgs - pass org_id to invalidate only the org that changed")
+    with _org_rules_cache_lock:
+        if org_id:
+            _org_rules_cache.pop(org_id, None)
+        else:
+            _org_rules_cache.clear()
+    log.debug("Rules cache cleared for: %s", org_id or "all")
+
+
+# ============================================================
+# RULES CHANGE NOTIFICATIONS (LISTEN/NOTIFY)
+# A trigger on constraint_policies sends {"org_id": ...} on every write;
+# each worker listens and drops only that org's cache entry. The trigger is
+# part of the schema (web/prisma/sql/constraint_policies_notify.sql), not
+# installed from here.
+# ============================================================
+RULES_CHANGED_CHANNEL = "constraint_policies_changed"
+RULES_CACHE_LISTEN = os.getenv("RULES_CACHE_LISTEN", "true").lower() == "true"
+RULES_CACHE_WARM = os.getenv("RULES_CACHE_WARM", "true").lower() == "true"
+RULES_LISTEN_RETRY_SECONDS = 30
+
+_rules_listener_started = False
+_rules_listener_lock = threading.Lock()
+
+
+def _rules_change_listener():
+    """Background loop: LISTEN for policy changes and invalidate the affected org"""
+    connected_before = False
+    while True:
+        conninfo = _get_conninfo()
+        if conninfo is None:
+            return
+        try:
+            with psycopg.connect(conninfo, autocommit=True) as conn:
+                conn.execute(f"LISTEN {RULES_CHANGED_CHANNEL}")
+                if connected_before:
+                    # Notifications sent while we were disconnected are lost
+                    with _org_rules_cache_lock:
+                        _org_rules_cache.clear()
+                connected_before = True
+                log.info("Listening for rule changes on %s", RULES_CHANGED_CHANNEL)
+                
+                for notify in conn.notifies():
+                    try:
+                        org_id = json.loads(notify.payload).get("org_id")
+                    except (ValueError, AttributeError):
+                        org_id = None
+                    if org_id:
+                        # Drop the stale entry and reload it so the next request is still a hit
+                        clear_org_rules_cache(org_id)
+                        prefetch_org_constraint_rules([org_id])
+        except Exception as e:
+            log.warning("Rules change listener error, reconnecting in %ss: %s", RULES_LISTEN_RETRY_SECONDS, e)
+        time.sleep(RULES_LISTEN_RETRY_SECONDS)
+
+
+def _ensure_rules_listener():
+    """Start the listener thread once per process (after any worker fork)"""
+    global _rules_listener_started
+    if _rules_listener_started or not RULES_CACHE_LISTEN:
+        return
+    with _rules_listener_lock:
+        if not _rules_listener_started:
+            threading.Thread(target=_rules_change_listener, name="rules-change-listener", daemon=True).start()
+            _rules_listener_started = True
+
+
+def cache_info() -> Dict:
+    """Org rules cache counters (hits/misses/evictions) and current size"""
+    return {
+        **_org_rules_cache_stats,
+        "size": len(_org_rules_cache),
+        "max_size": MAX_ORG_CACHE,
+        "ttl_seconds": CACHE_TTL_SECONDS
+    }
 
 
 def get_rule_config(rules: Dict, rule_id: str, config_key: str, default=None):
     """
-    Safely get a config value from a rule, handling both nested and flat structures.
+    Safely get a config value from a rule.
+    Cached rules are normalized (every rule has a "config" dict), so no flat-format fallback here.
     """
-    rule = rules.get(rule_id, {})
-    config = rule.get("config", {})
-    
-    # Check nested config first
-    if config_key in config:
-        return config[config_key]
-    
-    # Check flat structure (old format)
-    if config_key in rule:
-        return rule[config_key]
-    
-    # Return default
-    return default
-
+    return rules.get(rule_id, _EMPTY).get("config", _EMPTY).get(config_key, default)
 
-from urllib.parse import urlparse, unquote
-
-from urllib.parse import quote_plus
 
 # ============================================================
 # CONNECTION POOL MANAGEMENT
-# Single persistent connection for performance
+# psycopg_pool: concurrent requests each borrow their own connection
 # ============================================================
-_connection_pool = None
-
-class PooledConnection:
-    """Wrapper around psycopg connection that ignores close() calls"""
-    def __init__(self, conn):
-        self._conn = conn
-        
-    def cursor(self, *args, **kwargs):
-        # psycopg3 uses row_factory instead of cursor_factory
-        if 'row_factory' not in kwargs:
-            kwargs['row_factory'] = dict_row
-        return self._conn.cursor(**kwargs)
-    
-    def commit(self):
-        return self._conn.commit()
-    
-    def rollback(self):
-        return self._conn.rollback()
-    
-    def close(self):
-        # NO-OP: Don't actually close the pooled connection
-        pass
-    
-    @property
-    def closed(self):
-        return self._conn.closed
-    
-    @property
-    def autocommit(self):
-        return self._conn.autocommit
-    
-    @autocommit.setter
-    def autocommit(self, value):
-        self._conn.autocommit = value
 
-def _create_connection():
-    """Create a new database connection"""
-    print(f"🔌 Creating new DB connection...", file=sys.stderr)
-    
+@functools.lru_cache(maxsize=None)
+def _get_conninfo() -> Optional[str]:
+    """
+    Build the libpq connection string from DATABASE_URL or the explicit DB_* variables.
+    The environment is fixed for the process, so it is built once and reused on every reconnect.
+    """
     # Priority 1: DATABASE_URL (Recommended for poolers/Supabase)
     if DB_URL:
-        url_to_use = DB_URL
-        if 'sslmode' not in url_to_use:
-            sep = '&' if '?' in url_to_use else '?'
-            url_to_use += f"{sep}sslmode=require"
-        conn = psycopg.connect(url_to_use, autocommit=True)
-        return conn
+        # Parse rather than substring-match, so e.g. "?application_name=sslmode_test" still gets TLS
+        if "sslmode" not in conninfo_to_dict(DB_URL):
+            return make_conninfo(DB_URL, sslmode="require")
+        return DB_URL
 
     # Priority 2: Explicit Variables Fallback
     if DB_HOST and DB_USER and DB_PASSWORD:
-        conn = psycopg.connect(
+        return make_conninfo(
             host=DB_HOST,
             user=DB_USER,
             password=DB_PASSWORD,
             port=DB_PORT,
             dbname=DB_NAME,
-            sslmode=DB_SSL,
-            autocommit=True
+            sslmode=DB_SSL
         )
-        return conn
         
-    print("❌ Database configuration missing (DATABASE_URL or DB_HOST/USER/PASS)", file=sys.stderr)
+    log.error("Database configuration missing (DATABASE_URL or DB_HOST/USER/PASS)")
     return None
 
-def get_db_connection():
-    """Get database connection from pool (creates if needed, reconnects if stale)"""
-    global _connection_pool
-    
-    try:
-        # Check if existing connection is valid
-        if _connection_pool and not _connection_pool.closed:
-            try:
-                # Quick health check - ensure connection is still alive
-                cur = _connection_pool._conn.cursor()
-                cur.execute("SELECT 1")
-                cur.close()
-                return _connection_pool
-            except Exception:
-                # Connection is dead, need to reconnect
-                print("⚠️ Connection stale, reconnecting...", file=sys.stderr)
-                _connection_pool = None
-        
-        # Create new connection
-        raw_conn = _create_connection()
-        if raw_conn:
-            _connection_pool = PooledConnection(raw_conn)
-            print("✅ DB connection pool initialized", file=sys.stderr)
-            return _connection_pool
-        return None
-
-    except Exception as e:
-        print(f"❌ Database connection error: {e}", file=sys.stderr)
-        _connection_pool = None
+# Shared pool: connections are borrowed per call and returned, never closed
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+DB_POOL_MAX_LIFETIME = 3600  # seconds before a connection is recycled
+DB_POOL_TIMEOUT = 5  # seconds to wait for a free connection before failing
+
+# Executions before psycopg prepares a statement server-side. Unset keeps psycopg's own
+# default (5); a direct (session) connection can opt into 1 so the hot balance/employee
+# lookups skip parse+plan from their second run. Set DB_PREPARE_THRESHOLD=off behind a
+# transaction-mode pooler (e.g. Supabase's) that can't keep prepared statements per session.
+PSYCOPG_DEFAULT_PREPARE_THRESHOLD = 5
+
+
+def _parse_prepare_threshold(value: Optional[str]) -> Optional[int]:
+    """DB_PREPARE_THRESHOLD as psycopg's prepare_threshold: an int, or None to disable"""
+    value = (value or "").strip().lower()
+    if not value:
+        return PSYCOPG_DEFAULT_PREPARE_THRESHOLD
+    if value in ("off", "none"):
         return None
+    try:
+        threshold = int(value)
+        if threshold < 0:
+            raise ValueError(value)
+        return threshold
+    except ValueError:
+        log.warning("Invalid DB_PREPARE_THRESHOLD=%r, using psycopg's default (%d)",
+                    value, PSYCOPG_DEFAULT_PREPARE_THRESHOLD)
+        return PSYCOPG_DEFAULT_PREPARE_THRESHOLD
+
+
+DB_PREPARE_THRESHOLD = _parse_prepare_threshold(os.environ.get("DB_PREPARE_THRESHOLD"))
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+def _get_db_pool() -> Optional[ConnectionPool]:
+    """Create the connection pool on first use (after any worker fork)"""
+    global _db_pool
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                conninfo = _get_conninfo()
+                if conninfo is None:
+                    return None
+                _db_pool = ConnectionPool(
+                    conninfo,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    timeout=DB_POOL_TIMEOUT,
+                    kwargs={
+                        "autocommit": True,
+                        "row_factory": dict_row,
+                        "prepare_threshold": DB_PREPARE_THRESHOLD
+                    },
+                    open=True
+                )
+                log.info("DB connection pool initialized")
+    return _db_pool
+
+@contextmanager
+def get_db_connection():
+    """
+    Borrow a connection from the pool; it is returned to the pool on exit.
+    Raises psycopg.OperationalError if the database is not configured or unreachable.
+    """
+    pool = _get_db_pool()
+    if pool is None:
+        raise psycopg.OperationalError("Database configuration missing")
+    with pool.connection() as conn:
+        yield conn
 
 def test_db_connection():
     """Test connection on startup and print status"""
-    conn = get_db_connection()
-    if conn:
-        try:
-            print("\n" + "="*60)
-            print("✅ DATABASE CONNECTED SUCCESSFULLY")
-            print("="*60 + "\n")
-            # Don't close - connection pool handles this
-            return True
-        except Exception:
-            pass
+    try:
+        with get_db_connection() as conn:
+            conn.execute("SELECT 1")
+        print("\n" + "="*60)
+        print("✅ DATABASE CONNECTED SUCCESSFULLY")
+        print("="*60 + "\n")
+        return True
+    except Exception as e:
+        print(f"❌ Database connection error: {e}", file=sys.stderr)
     
     print("\n" + "="*60)
     print("❌ DATABASE CONNECTION FAILED")
     print("="*60 + "\n")
     return False
 
-# Test DB connection on startup
-test_db_connection()
 
+@functools.lru_cache(maxsize=1024)
+def parse_iso_datetime(value: str) -> datetime:
+    """
+    datetime.fromisoformat, memoized. One evaluation parses the same start/end
+    strings in several rules; datetimes are immutable, so sharing them is safe.
+    """
+    return datetime.fromisoformat(value)
 
+
+# Business days among the first `remainder` days of a week starting on `first_weekday`
+# (Monday = 0), indexed [first_weekday][remainder] for remainder 0-6
+_LEFTOVER_BUSINESS_DAYS = tuple(
+    tuple(sum(1 for i in range(remainder) if (first_weekday + i) % 7 < 5) for remainder in range(7))
+    for first_weekday in range(7)
+)
+
+
+@functools.lru_cache(maxsize=4096)
 def calculate_business_days(start_date: str, end_date: str) -> int:
     """Calculate business days between two dates (excluding weekends)"""
-    start = datetime.strptime(start_date, "%Y-%m-%d")
-    end = datetime.strptime(end_date, "%Y-%m-%d")
+    start = parse_iso_datetime(start_date)
+    end = parse_iso_datetime(end_date)
     
-    business_days = 0
-    current = start
-    while current <= end:
-        if current.weekday() < 5:  # Monday = 0, Friday = 4
-            business_days += 1
-        current += timedelta(days=1)
+    total_days = (end - start).days + 1
+    if total_days <= 0:
+        return 0
     
-    return business_days
+    # Every full week has 5 business days; the leftover days come from the lookup table
+    full_weeks, remainder = divmod(total_days, 7)
+    return full_weeks * 5 + _LEFTOVER_BUSINESS_DAYS[start.weekday()][remainder]
+
+
+def add_business_days(start: date, business_days: int) -> date:
+    """Date reached by stepping forward the given number of business days from start"""
+    if business_days <= 0:
+        return start
+    # Every 7 calendar days hold exactly 5 business days; step the last (1-5) individually
+    # so the result always lands on a weekday
+    full_weeks, remainder = divmod(business_days - 1, 5)
+    end = start + timedelta(weeks=full_weeks)
+    remainder += 1
+    while remainder:
+        end += timedelta(days=1)
+        if end.weekday() < 5:
+            remainder -= 1
+    return end
+
+
+# Weekday parsing
+_WEEKDAY_NUMBERS = {
+    'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
+    'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6
+}
+_WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
 
+_MONTH_NUMBERS = {
+    'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
+    'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
+    'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
+}
 
-def get_leave_balance(emp_id: str, leave_type: str) -> int:
-    """Get leave balance for specific type"""
-    conn = get_db_connection()
-    if not conn:
-        # Fallback to default limit if DB down
-        return CONSTRAINT_RULES["RULE001"]["limits"].get(leave_type, 0)
-    
-    # Map leave types to database values
-    leave_type_map = {
-        "Annual Leave": "vacation",
-        "Sick Leave": "sick",
-        "Emergency Leave": "emergency",
-        "Personal Leave": "personal",
-        "Maternity Leave": "maternity",
-        "Paternity Leave": "paternity",
-        "Bereavement Leave": "bereavement",
-        "Study Leave": "study"
-    }
-    db_leave_type = leave_type_map.get(leave_type, leave_type.lower().replace(" leave", ""))
-    
-    try:
-        cur = conn.cursor(row_factory=dict_row)
-        cur.execute("""
-            SELECT annual_entitlement, carried_forward, used_days, pending_days 
-            FROM leave_balances 
-            WHERE emp_id = %s AND leave_type = %s
-        """, (emp_id, db_leave_type))
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if result:
-            entitlement = float(result['annual_entitlement'] or 0)
-            carried = float(result['carried_forward'] or 0)
-            used = float(result['used_days'] or 0)
-            pending = float(result['pending_days'] or 0)
-            remaining = entitlement + carried - used - pending
-            return remaining
-        else:
-            # If no record, assume full entitlement (default)
-            print(f"⚠️ No balance record for {leave_type}, assuming default entitlement.")
-            return CONSTRAINT_RULES["RULE001"]["limits"].get(leave_type, 0)
-            
-    except Exception as e:
-        print(f"❌ Error getting balance: {e}")
-        if conn:
-            conn.close()
-        return 0
+# Patterns used by extract_leave_info, compiled once at import
+_RE_DAYS = re.compile(r'(\d+)\s*days?')
+_RE_A_DAY = re.compile(r'\b(a|one|1)\s*day\b')
+# Every weekday name as a whole word, in one pass (at most one name fits between two word boundaries)
+_RE_WEEKDAY_WORDS = re.compile(rf"\b(?:{'|'.join(_WEEKDAY_NUMBERS)})\b")
+# (day_name, day_num, "next <day>", "on <day>", "this <day>") in _WEEKDAY_NUMBERS order
+_WEEKDAY_PHRASES = tuple((day_name, day_num, f"next {day_name}", f"on {day_name}", f"this {day_name}")
+                         for day_name, day_num in _WEEKDAY_NUMBERS.items())
+# "month day" - e.g. "march 3", "jan 5th"
+_RE_MONTH_DAY = re.compile(rf'({"|".join(_MONTH_NUMBERS)})\s*(\d{{1,2}})(?:st|nd|rd|th)?')
+
+# Leave type keywords, checked in order - specific event types first, then general categories.
+# Plain substring tests (no word boundaries): `in` on a short text beats any regex alternation.
+_LEAVE_TYPE_KEYWORDS = [
+    # Personal events (wedding, family events) - Casual/Annual Leave
+    ("Annual Leave", ["wedding", "marriage", "attend", "ceremony", "function", "celebration", "party", "event"]),
+    # Sick leave indicators
+    ("Sick Leave", ["sick", "ill", "fever", "cold", "flu", "doctor", "medical", "hospital", "health", "unwell", "not feeling well", "feeling unwell", "not well"]),
+    ("Emergency Leave", ["emergency", "urgent", "crisis", "family emergency"]),
+    ("Annual Leave", ["vacation", "holiday", "trip", "travel", "casual"]),
+    ("Personal Leave", ["personal", "private"]),
+    ("Maternity Leave", ["maternity", "pregnancy"]),
+    ("Paternity Leave", ["paternity", "father", "newborn"]),
+    ("Bereavement Leave", ["funeral", "bereavement", "death", "passed away"]),
+    ("Study Leave", ["study", "exam", "course", "training"]),
+]
+# Flattened to (keyword, type_name) in check order: the first keyword found gives the first matching type
+_LEAVE_TYPE_KEYWORD_ORDER = tuple(
+    (keyword, type_name) for type_name, keywords in _LEAVE_TYPE_KEYWORDS for keyword in keywords
+)
+
+# Explicit leave_type values sent by the web app, checked in order
+_REQUEST_LEAVE_TYPE_KEYWORDS = (
+    ("Annual Leave", ("casual", "annual")),
+    ("Sick Leave", ("sick",)),
+    ("Emergency Leave", ("emergency",)),
+    ("Personal Leave", ("personal",)),
+)
+_REQUEST_LEAVE_TYPE_KEYWORD_ORDER = tuple(
+    (keyword, type_name) for type_name, keywords in _REQUEST_LEAVE_TYPE_KEYWORDS for keyword in keywords
+)
+
+
+def normalize_leave_type(value: str) -> Optional[str]:
+    """Map a client-supplied leave type (e.g. "casual", "Sick Leave") to our internal name"""
+    value = value.lower()
+    for keyword, type_name in _REQUEST_LEAVE_TYPE_KEYWORD_ORDER:
+        if keyword in value:
+            return type_name
+    return None
 
 
 def extract_leave_info(text: str) -> Dict:
     """Extract leave information from natural language text"""
     text_lower = text.lower()
-    today = datetime.now()
+    today = date.today()
     
     # Extract number of days - default to 1 day
     days_requested = 1
     
     # Pattern: "X days" or "X day" (including "1 day")
-    days_match = re.search(r'(\d+)\s*days?', text_lower)
+    days_match = _RE_DAYS.search(text_lower)
     if days_match:
         days_requested = max(1, int(days_match.group(1)))
     
@@ -644,7 +1080,7 @@ def extract_leave_info(text: str) -> Dict:
         days_requested = 1
     
     # Pattern: "a day" or "one day" or "1 day"
-    if re.search(r'\b(a|one|1)\s*day\b', text_lower):
+    if _RE_A_DAY.search(text_lower):
         days_requested = 1
     
     # Pattern: "a week" = 5 business days
@@ -658,100 +1094,61 @@ def extract_leave_info(text: str) -> Dict:
     # Detect leave type - check for specific event types first, then general categories
     leave_type = "Annual Leave"  # Default
     
-    # Personal events (wedding, family events) - Casual/Annual Leave
-    if any(kw in text_lower for kw in ["wedding", "marriage", "attend", "ceremony", "function", "celebration", "party", "event"]):
-        leave_type = "Annual Leave"
-    # Sick leave indicators
-    elif any(kw in text_lower for kw in ["sick", "ill", "fever", "cold", "flu", "doctor", "medical", "hospital", "health", "unwell", "not feeling well", "feeling unwell", "not well"]):
-        leave_type = "Sick Leave"
-    elif any(kw in text_lower for kw in ["emergency", "urgent", "crisis", "family emergency"]):
-        leave_type = "Emergency Leave"
-    elif any(kw in text_lower for kw in ["vacation", "holiday", "trip", "travel", "casual"]):
-        leave_type = "Annual Leave"
-    elif any(kw in text_lower for kw in ["personal", "private"]):
-        leave_type = "Personal Leave"
-    elif any(kw in text_lower for kw in ["maternity", "pregnancy"]):
-        leave_type = "Maternity Leave"
-    elif any(kw in text_lower for kw in ["paternity", "father", "newborn"]):
-        leave_type = "Paternity Leave"
-    elif any(kw in text_lower for kw in ["funeral", "bereavement", "death", "passed away"]):
-        leave_type = "Bereavement Leave"
-    elif any(kw in text_lower for kw in ["study", "exam", "course", "training"]):
-        leave_type = "Study Leave"
+    for keyword, type_name in _LEAVE_TYPE_KEYWORD_ORDER:
+        if keyword in text_lower:
+            leave_type = type_name
+            break
     
     # Extract dates
     start_date = None
     end_date = None
     
-    # Weekday parsing
-    weekdays = {
-        'monday': 0, 'tuesday': 1, 'wednesday': 2, 'thursday': 3, 'friday': 4, 'saturday': 5, 'sunday': 6,
-        'mon': 0, 'tue': 1, 'wed': 2, 'thu': 3, 'fri': 4, 'sat': 5, 'sun': 6
-    }
-    
     # Check for specific weekdays (e.g., "on Wednesday", "next Friday")
     weekday_found = False
-    for day_name, day_num in weekdays.items():
-        if f"next {day_name}" in text_lower:
+    weekday_words = set(_RE_WEEKDAY_WORDS.findall(text_lower))
+    for day_name, day_num, next_phrase, on_phrase, this_phrase in _WEEKDAY_PHRASES:
+        if next_phrase in text_lower:
             days_ahead = (day_num - today.weekday() + 7) % 7
             if days_ahead == 0: days_ahead = 7
-            start_date = (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+            start_date = (today + timedelta(days=days_ahead)).isoformat()
             weekday_found = True
             break
-        elif f"on {day_name}" in text_lower or f"this {day_name}" in text_lower or re.search(rf"\b{day_name}\b", text_lower):
+        elif on_phrase in text_lower or this_phrase in text_lower or day_name in weekday_words:
             # Calculate days ahead for the coming occurrence
+            # If user says "Wednesday" on Sunday, it's +3 days: (2 - 6) % 7 = 3
             days_ahead = (day_num - today.weekday()) % 7
-            if days_ahead <= 0: # If today or past, assume next week unless specified
-                 if days_ahead == 0 and "today" not in text_lower:
-                     days_ahead = 7
-                 elif days_ahead < 0:
-                     days_ahead += 7
-            
-            # If "this" usually implies current week, but simple collision handling:
-            # If user says "Wednesday" on Sunday, it's +3 days.
-            if today.weekday() > day_num: # e.g. Sunday(6) asking for Wednesday(2) -> Next Wed
-                 # Logic: (2 - 6) % 7 = -4 % 7 = 3. Correct.
-                 pass
-            
-            start_date = (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+            if days_ahead == 0 and "today" not in text_lower: # If today, assume next week unless specified
+                days_ahead = 7
+            start_date = (today + timedelta(days=days_ahead)).isoformat()
             weekday_found = True
             break
 
     if weekday_found:
         pass # Date set above
     elif "tomorrow" in text_lower:
-        start_date = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date = (today + timedelta(days=1)).isoformat()
     elif "today" in text_lower:
-        start_date = today.strftime("%Y-%m-%d")
+        start_date = today.isoformat()
     elif "next monday" in text_lower: # Keep legal fallback
         days_ahead = (0 - today.weekday()) % 7
         if days_ahead == 0:
             days_ahead = 7
-        start_date = (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+        start_date = (today + timedelta(days=days_ahead)).isoformat()
     elif "next week" in text_lower:
         days_ahead = 7 - today.weekday()
-        start_date = (today + timedelta(days=days_ahead)).strftime("%Y-%m-%d")
+        start_date = (today + timedelta(days=days_ahead)).isoformat()
     
     # Check for month day patterns - handle date ranges with different months
-    month_names = {
-        'january': 1, 'february': 2, 'march': 3, 'april': 4, 'may': 5, 'june': 6,
-        'july': 7, 'august': 8, 'september': 9, 'october': 10, 'november': 11, 'december': 12,
-        'jan': 1, 'feb': 2, 'mar': 3, 'apr': 4, 'jun': 6, 'jul': 7, 'aug': 8, 'sep': 9, 'oct': 10, 'nov': 11, 'dec': 12
-    }
-    
-    # Build month pattern regex
-    month_pattern = '|'.join(month_names.keys())
-    
     # Pattern: "month day" - find all occurrences
-    date_matches = re.findall(rf'({month_pattern})\s*(\d{{1,2}})(?:st|nd|rd|th)?', text_lower)
+    date_matches = _RE_MONTH_DAY.findall(text_lower)
     
     if len(date_matches) >= 2:
         # We have at least two dates - treat as date range
         start_month_name, start_day = date_matches[0]
         end_month_name, end_day = date_matches[1]
         
-        start_month = month_names[start_month_name]
-        end_month = month_names[end_month_name]
+        start_month = _MONTH_NUMBERS[start_month_name]
+        end_month = _MONTH_NUMBERS[end_month_name]
         start_day = int(start_day)
         end_day = int(end_day)
         
@@ -764,37 +1161,32 @@ def extract_leave_info(text: str) -> Dict:
             end_year = start_year
         
         try:
-            start_date = datetime(start_year, start_month, start_day).strftime("%Y-%m-%d")
-            end_date = datetime(end_year, end_month, end_day).strftime("%Y-%m-%d")
+            start_date = date(start_year, start_month, start_day).isoformat()
+            end_date = date(end_year, end_month, end_day).isoformat()
         except ValueError as e:
-            print(f"Date parsing error: {e}")
+            log.debug("Date parsing error: %s", e)
             
     elif len(date_matches) == 1:
         # Single date found
         month_name, day = date_matches[0]
-        month_num = month_names[month_name]
+        month_num = _MONTH_NUMBERS[month_name]
         day = int(day)
         year = today.year if month_num >= today.month else today.year + 1
         try:
-            start_date = datetime(year, month_num, day).strftime("%Y-%m-%d")
+            start_date = date(year, month_num, day).isoformat()
         except ValueError:
             pass
     
     # If no start date found, default to tomorrow
     if not start_date:
-        start_date = (today + timedelta(days=1)).strftime("%Y-%m-%d")
+        start_date = (today + timedelta(days=1)).isoformat()
     
     # Calculate end date based on days requested
     if not end_date:
-        start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-        # Add business days
-        end_dt = start_dt
-        days_added = 1
-        while days_added < days_requested:
-            end_dt += timedelta(days=1)
-            if end_dt.weekday() < 5:
-                days_added += 1
-        end_date = end_dt.strftime("%Y-%m-%d")
+        start_dt = date.fromisoformat(start_date)
+        # Start day counts as the first day requested
+        end_dt = add_business_days(start_dt, days_requested - 1)
+        end_date = end_dt.isoformat()
     
     # Recalculate actual days if we have both dates
     actual_days = calculate_business_days(start_date, end_date)
@@ -808,140 +1200,244 @@ def extract_leave_info(text: str) -> Dict:
     }
 
 
-def get_employee_info(emp_id: str) -> Optional[Dict]:
-    """Get employee information from database"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
-    try:
-        cur = conn.cursor(row_factory=dict_row)
+# ============================================================
+# EMPLOYEE & BALANCE CACHE
+# ============================================================
+
+class _TTLCache:
+    """Small thread-safe LRU cache whose entries expire ttl seconds after being stored"""
+    __slots__ = ("ttl", "maxsize", "_entries", "_lock")
+
+    def __init__(self, ttl: float, maxsize: int):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[object, Tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                return entry[1]
+        return default
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def discard_if(self, predicate: Callable[[object], bool]) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Caches for rows read on every evaluation. Employee rows (department, org, hire date)
+# rarely change, so they live as long as the org rules cache. Balances are also changed
+# outside this service (approvals in the web app), so keep that TTL short; local writes invalidate.
+EMPLOYEE_CACHE_TTL_SECONDS = CACHE_TTL_SECONDS
+BALANCE_CACHE_TTL_SECONDS = 30
+_employee_cache = _TTLCache(EMPLOYEE_CACHE_TTL_SECONDS, maxsize=512)
+_balance_cache = _TTLCache(BALANCE_CACHE_TTL_SECONDS, maxsize=1024)  # (emp_id, db_leave_type) -> row
+
+
+@with_db_retry
+def _fetch_employee(emp_id: str) -> Optional[Dict]:
+    with get_db_connection() as conn, conn.cursor() as cur:
         # Simplify query: just get employee info. Team info inferred from department later.
         cur.execute("""
             SELECT e.*, e.department as team_name
             FROM employees e
             WHERE e.emp_id = %s
         """, (emp_id,))
-        employee = cur.fetchone()
-        cur.close()
-        conn.close()
+        return cur.fetchone()
+
+
+def get_employee_info(emp_id: str) -> Optional[Dict]:
+    """Get employee information from database"""
+    employee = _context_lookup("employee", emp_id)
+    if employee is not _NOT_PREFETCHED:
+        return employee
+    employee = _employee_cache.get(emp_id)
+    if employee is not None:
+        return employee
+    try:
+        employee = _fetch_employee(emp_id)
+        if employee:
+            _employee_cache.set(emp_id, employee)
         return employee
     except Exception as e:
-        print(f"❌ Error getting employee: {e}")
-        if conn:
-            conn.close()
+        log.warning("Error getting employee: %s", e)
         return None
 
 
-def ensure_leave_balance(emp_id: str, leave_type: str, cursor) -> None:
-    """Ensure leave balance record exists for the employee"""
-    # 1. Check if exists
-    cursor.execute("""
-        SELECT 1 FROM leave_balances 
-        WHERE emp_id = %s AND leave_type = %s
-    """, (emp_id, leave_type))
-    
-    if cursor.fetchone():
-        return
+def invalidate_employee(emp_id: str) -> None:
+    """Drop an employee's cached row and balances, e.g. after HR edits them outside this service"""
+    _employee_cache.discard(emp_id)
+    _balance_cache.discard_if(lambda key: key[0] == emp_id)
 
-    # 2. Get Default Entitlement
-    # Find readable name to rule key map
-    # Reverse map for safety
-    entitlements = CONSTRAINT_RULES["RULE001"]["limits"]
-    # We need to find the Key (e.g. "Annual Leave") based on database value (e.g. "vacation")
-    # For now, simplistic mapping or default 0
-    
-    # Map db_type back to readable for rule lookup
-    # This is rough, but effective for defaults
-    db_to_readable = {
-        "vacation": "Annual Leave",
-        "sick": "Sick Leave",
-        "emergency": "Emergency Leave",
-        "personal": "Personal Leave",
-        "maternity": "Maternity Leave",
-        "paternity": "Paternity Leave",
-        "bereavement": "Bereavement Leave",
-        "study": "Study Leave"
-    }
-    
-    readable_name = db_to_readable.get(leave_type, "Annual Leave")
-    default_days = entitlements.get(readable_name, 0)
-    
-    # 3. Create Record
-    current_year = datetime.now().year
+
+# Map leave types to database values
+BALANCE_LEAVE_TYPE_MAP = {
+    "Annual Leave": "vacation",
+    "Sick Leave": "sick",
+    "Emergency Leave": "emergency",
+    "Personal Leave": "personal",
+    "Maternity Leave": "maternity",
+    "Paternity Leave": "paternity",
+    "Bereavement Leave": "bereavement",
+    "Study Leave": "study"
+}
+# And back, for default entitlement lookups
+BALANCE_LEAVE_TYPE_NAMES = {db_type: name for name, db_type in BALANCE_LEAVE_TYPE_MAP.items()}
+
+
+def ensure_leave_balance(emp_id: str, leave_type: str, cursor) -> Optional[Tuple]:
+    """
+    Ensure leave balance record exists for the employee, in one idempotent statement.
+    Returns the new row in _BALANCE_QUERY's shape, or None if it already existed (e.g. a concurrent request made it).
+    """
+    # Default entitlement: map db_type back to the readable name used by the RULE001 limits
+    readable_name = BALANCE_LEAVE_TYPE_NAMES.get(leave_type, "Annual Leave")
+    default_days = CONSTRAINT_RULES["RULE001"]["config"]["limits"].get(readable_name, 0)
+    current_year = date.today().year
     
     # Use country code from employee or default 'IN'
-    cursor.execute("SELECT country_code FROM employees WHERE emp_id = %s", (emp_id,))
-    res = cursor.fetchone()
-    country = res['country_code'] if res else 'IN'
-    
-    print(f"✨ Initializing {readable_name} balance for {emp_id}: {default_days} days")
-    
     cursor.execute("""
         INSERT INTO leave_balances (
             emp_id, country_code, leave_type, year, 
             annual_entitlement, carried_forward, used_days, pending_days
-        ) VALUES (%s, %s, %s, %s, %s, 0, 0, 0)
-    """, (emp_id, country, leave_type, current_year, default_days))
+        )
+        SELECT %s, COALESCE((SELECT country_code FROM employees WHERE emp_id = %s), 'IN'), %s, %s, %s, 0, 0, 0
+        ON CONFLICT (emp_id, leave_type, year) DO NOTHING
+        RETURNING (annual_entitlement + carried_forward - used_days - pending_days)::float8
+    """, (emp_id, emp_id, leave_type, current_year, default_days))
+    
+    created = cursor.fetchone()
+    if created:
+        log.info("Initialized %s balance for %s: %s days", readable_name, emp_id, default_days)
+    return created
+
+
+# Total Available = (Entitlement + Carried) - (Used + Pending), summed as NUMERIC and sent as a
+# single float8 so callers read one scalar off a tuple row instead of converting four Decimals
+_BALANCE_QUERY = """
+    SELECT (COALESCE(annual_entitlement, 0) + COALESCE(carried_forward, 0)
+            - COALESCE(used_days, 0) - COALESCE(pending_days, 0))::float8 as available
+    FROM leave_balances
+    WHERE emp_id = %s AND leave_type = %s
+"""
+
+
+@with_db_retry
+def _fetch_leave_balance(emp_id: str, db_leave_type: str) -> Optional[Tuple]:
+    with get_db_connection() as conn, conn.cursor(row_factory=tuple_row) as cur:
+        # Single read on the common path - the record usually exists already
+        cur.execute(_BALANCE_QUERY, (emp_id, db_leave_type), binary=True)
+        result = cur.fetchone()
+
+        if not result:
+            # LAZY INIT: Create the record on first use (autocommit). Safe to retry: the insert
+            # is a no-op when the row exists, and only then do we need to read it back.
+            result = ensure_leave_balance(emp_id, db_leave_type, cur)
+            if not result:
+                cur.execute(_BALANCE_QUERY, (emp_id, db_leave_type), binary=True)
+                result = cur.fetchone()
+        return result
+
+
+def _balance_leave_type(leave_type: str) -> str:
+    """leave_balances.leave_type value for a readable leave type"""
+    return BALANCE_LEAVE_TYPE_MAP.get(leave_type) or leave_type.lower().replace(" leave", "")
 
 
 def get_leave_balance(emp_id: str, leave_type: str) -> int:
     """Get leave balance for specific type (Calculated from entitlement - used)"""
-    conn = get_db_connection()
-    if not conn:
-        # Fallback to default limit if DB down
-        return CONSTRAINT_RULES["RULE001"]["limits"].get(leave_type, 0)
-    
-    # Map leave types to database values
-    leave_type_map = {
-        "Annual Leave": "vacation",
-        "Sick Leave": "sick",
-        "Emergency Leave": "emergency",
-        "Personal Leave": "personal",
-        "Maternity Leave": "maternity",
-        "Paternity Leave": "paternity",
-        "Bereavement Leave": "bereavement",
-        "Study Leave": "study"
-    }
-    db_leave_type = leave_type_map.get(leave_type, leave_type.lower().replace(" leave", ""))
-    
+    db_leave_type = _balance_leave_type(leave_type)
+
     try:
-        cur = conn.cursor(row_factory=dict_row)
-        
-        # LAZY INIT: Ensure record exists before querying
-        ensure_leave_balance(emp_id, db_leave_type, cur)
-        conn.commit() # Commit creation
-        
-        # Query again
-        cur.execute("""
-            SELECT annual_entitlement, carried_forward, used_days, pending_days 
-            FROM leave_balances 
-            WHERE emp_id = %s AND leave_type = %s
-        """, (emp_id, db_leave_type))
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+        # Prefetched by the current evaluation, if any; a missing row still goes through lazy init
+        result = _context_lookup("balance", (emp_id, db_leave_type))
+        if result is _NOT_PREFETCHED or not result:
+            result = _balance_cache.get((emp_id, db_leave_type))
+        if not result:
+            result = _fetch_leave_balance(emp_id, db_leave_type)
+            if result:
+                _balance_cache.set((emp_id, db_leave_type), result)
         
         if result:
-            entitlement = float(result['annual_entitlement'] or 0)
-            carried = float(result['carried_forward'] or 0)
-            used = float(result['used_days'] or 0)
-            pending = float(result['pending_days'] or 0)
-            
-            # Logic: Total Available = (Entitlement + Carried) - (Used + Pending)
-            return (entitlement + carried) - (used + pending)
+            # Rows are (available,) - see _BALANCE_QUERY
+            return result[0]
         else:
             return 0 # Should not happen after ensure
-            
+    
+    except psycopg.OperationalError as e:
+        # Fallback to default limit if DB down
+        log.warning("Database unavailable for balance, using default entitlement: %s", e)
+        return CONSTRAINT_RULES["RULE001"]["config"]["limits"].get(leave_type, 0)
     except Exception as e:
-        print(f"❌ Error getting balance: {e}")
-        if conn:
-            conn.close()
+        log.warning("Error getting balance: %s", e)
         return 0
 
 
-def get_team_status(emp_id: str, start_date: str, end_date: str) -> Dict:
-    """Get team status including who's on leave (Using Department as Team)"""
+# Department size plus every overlapping approved/pending leave of a colleague, in one query.
+# Department comes from the caller when known, otherwise from the employee row.
+# Always returns at least one row; emp_id is NULL on it when nobody else is on leave.
+_TEAM_STATUS_QUERY = """
+    SELECT d.department,
+           (SELECT COUNT(*) FROM employees WHERE department = d.department AND is_active = true) as size,
+           lr.emp_id, e.full_name, lr.leave_type, lr.start_date, lr.end_date
+    FROM (SELECT COALESCE(%s::text, (SELECT department FROM employees WHERE emp_id = %s)) as department) d
+    LEFT JOIN (leave_requests lr JOIN employees e ON lr.emp_id = e.emp_id)
+        ON e.department = d.department
+        AND lr.emp_id != %s
+        AND lr.status IN ('approved', 'pending')
+        AND NOT (lr.end_date < %s OR lr.start_date > %s)
+"""
+
+
+def _team_status_from_rows(rows: List[Tuple]) -> Optional[Tuple[str, int, int, List[Dict]]]:
+    """(department, team_size, on_leave, members_on_leave) from _TEAM_STATUS_QUERY tuple rows"""
+    if not rows or not rows[0][0]:
+        return None
+    department, team_size = rows[0][:2]
+    members_on_leave = []
+    on_leave_ids = set()
+    for _, _, member_id, full_name, leave_type, start, end in rows:
+        if member_id:
+            on_leave_ids.add(member_id)
+            members_on_leave.append({"full_name": full_name, "leave_type": leave_type,
+                                     "start_date": start, "end_date": end})
+    return department, team_size, len(on_leave_ids), members_on_leave
+
+
+@with_db_retry
+def _fetch_team_status(emp_id: str, start_date: str, end_date: str,
+                       department: Optional[str]) -> Optional[Tuple[str, int, int, List[Dict]]]:
+    """(department, team_size, on_leave, members_on_leave), or None if the employee has no department"""
+    # Rows are only unpacked into the member list, so skip dict_row; every column type
+    # here has a binary loader
+    with get_db_connection() as conn, conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute(_TEAM_STATUS_QUERY, (department, emp_id, emp_id, start_date, end_date), binary=True)
+        return _team_status_from_rows(cur.fetchall())
+
+
+def get_team_status(emp_id: str, start_date: str, end_date: str, department: str = None) -> Dict:
+    """
+    Get team status including who's on leave (Using Department as Team).
+    Pass department when the caller already has the employee row to skip the lookup query.
+    """
     # Default response for employees not found or error
     default_response = {
         "team_id": None,
@@ -954,57 +1450,17 @@ def get_team_status(emp_id: str, start_date: str, end_date: str) -> Dict:
         "members_on_leave": []
     }
     
-    conn = get_db_connection()
-    if not conn:
-        return default_response
-    
     try:
-        cur = conn.cursor(row_factory=dict_row)
-        
-        # 1. Get Employee's Department
-        cur.execute("SELECT department FROM employees WHERE emp_id = %s", (emp_id,))
-        emp_data = cur.fetchone()
-        
-        if not emp_data or not emp_data['department']:
-            cur.close()
-            conn.close()
+        team = _context_lookup("team", (emp_id, start_date, end_date))
+        if team is _NOT_PREFETCHED:
+            if department is None:
+                # A cached employee row saves resolving the department in the query
+                employee = _employee_cache.get(emp_id)
+                department = employee.get('department') if employee else None
+            team = _fetch_team_status(emp_id, start_date, end_date, department)
+        if team is None:
             return default_response
-            
-        department = emp_data['department']
-        
-        # 2. Get Team Size (Count employees in same department)
-        cur.execute("SELECT COUNT(*) as size FROM employees WHERE department = %s AND is_active = true", (department,))
-        size_res = cur.fetchone()
-        team_size = size_res['size'] if size_res else 1
-        
-        # 3. Get Colleagues on Leave
-        # Find approved/pending leaves for OTHER employees in SAME department overlapping dates
-        cur.execute("""
-            SELECT COUNT(DISTINCT lr.emp_id) as on_leave
-            FROM leave_requests lr
-            JOIN employees e ON lr.emp_id = e.emp_id
-            WHERE e.department = %s
-            AND lr.emp_id != %s
-            AND lr.status IN ('approved', 'pending')
-            AND NOT (lr.end_date < %s OR lr.start_date > %s)
-        """, (department, emp_id, start_date, end_date))
-        leave_result = cur.fetchone()
-        on_leave = leave_result['on_leave'] if leave_result else 0
-        
-        # 4. Get Names of Colleagues on Leave
-        cur.execute("""
-            SELECT e.full_name, lr.leave_type, lr.start_date, lr.end_date
-            FROM leave_requests lr
-            JOIN employees e ON lr.emp_id = e.emp_id
-            WHERE e.department = %s
-            AND lr.emp_id != %s
-            AND lr.status IN ('approved', 'pending')
-            AND NOT (lr.end_date < %s OR lr.start_date > %s)
-        """, (department, emp_id, start_date, end_date))
-        members_on_leave = cur.fetchall()
-        
-        cur.close()
-        conn.close()
+        department, team_size, on_leave, members_on_leave = team
         
         # 5. Calculate Status
         # Default policy: 50% coverage required for departments
@@ -1021,61 +1477,191 @@ def get_team_status(emp_id: str, start_date: str, end_date: str) -> Dict:
             "members_on_leave": members_on_leave
         }
     except Exception as e:
-        print(f"❌ Error getting team status: {e}")
-        if conn:
-            conn.close()
+        log.warning("Error getting team status: %s", e)
         return default_response
 
 
+# Blackout periods change rarely (holidays, company freezes), so the whole table is
+# loaded at once and overlaps are found in memory. A failed load is retried sooner.
+BLACKOUT_CACHE_TTL_SECONDS = 3600
+BLACKOUT_RETRY_SECONDS = 60
+# (expires_at, start dates, [(start, end, row)]) - both lists sorted by start date
+_blackout_cache: Optional[Tuple[float, List[date], List[Tuple[date, date, Dict]]]] = None
+_blackout_cache_lock = threading.Lock()
+
+
+def _as_date(value) -> date:
+    """DATE/TIMESTAMP column value (or ISO string) as a date"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+@with_db_retry
+def _fetch_blackout_dates() -> List[Dict]:
+    with get_db_connection() as conn, conn.cursor() as cur:
+        # Check table structure - some tables might not have is_active column
+        cur.execute("SELECT * FROM blackout_dates")
+        return cur.fetchall()
+
+
+def _blackout_entries(rows: List[Dict]) -> List[Tuple[date, date, Dict]]:
+    """(start, end, row) per blackout row, sorted by start. Rows with a missing or bad date are skipped."""
+    entries = []
+    for row in rows:
+        try:
+            entries.append((_as_date(row['start_date']), _as_date(row['end_date']), row))
+        except (KeyError, TypeError, ValueError) as e:
+            # One bad row must not empty the whole list (RULE005 would then pass everything)
+            log.warning("Skipping blackout period %s with an invalid date: %s", row.get('id'), e)
+    entries.sort(key=lambda entry: entry[0])
+    return entries
+
+
+def _load_blackout_dates(now: float) -> Tuple[List[date], List[Tuple[date, date, Dict]]]:
+    """Return the cached blackout periods, reloading them when expired (now is time.monotonic())"""
+    global _blackout_cache
+    with _blackout_cache_lock:
+        if _blackout_cache and _blackout_cache[0] > now:
+            return _blackout_cache[1], _blackout_cache[2]
+        try:
+            entries = _blackout_entries(_fetch_blackout_dates())
+            expires_at = now + BLACKOUT_CACHE_TTL_SECONDS
+        except Exception as e:
+            log.warning("Error loading blackout dates: %s", e)
+            entries = []
+            expires_at = now + BLACKOUT_RETRY_SECONDS
+        starts = [entry[0] for entry in entries]
+        _blackout_cache = (expires_at, starts, entries)
+        return starts, entries
+
+
+def clear_blackout_dates_cache() -> None:
+    """Drop the cached blackout periods; the next check reloads them"""
+    global _blackout_cache
+    with _blackout_cache_lock:
+        _blackout_cache = None
+
+
 def get_blackout_dates(start_date: str, end_date: str) -> List[Dict]:
     """Check if dates fall in blackout period"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
     try:
-        cur = conn.cursor(row_factory=dict_row)
-        # Check table structure - some tables might not have is_active column
-        cur.execute("""
-            SELECT * FROM blackout_dates
-            WHERE NOT (end_date < %s OR start_date > %s)
-        """, (start_date, end_date))
-        blackouts = cur.fetchall()
-        cur.close()
-        conn.close()
-        return blackouts
+        # Same parser as the rules, so datetime-form input ("...T09:00") still matches
+        start = parse_iso_datetime(start_date).date()
+        end = parse_iso_datetime(end_date).date()
+        starts, entries = _load_blackout_dates(time.monotonic())
+        # Only periods starting on or before the end date can overlap
+        return [row for _, period_end, row in entries[:bisect.bisect_right(starts, end)]
+                if period_end >= start]
     except Exception as e:
-        print(f"❌ Error checking blackouts: {e}")
-        if conn:
-            conn.close()
+        log.warning("Error checking blackouts: %s", e)
         return []
 
 
+# Half-open start_date range rather than EXTRACT(MONTH/YEAR ...) so the
+# (emp_id, status, start_date, ...) index can serve it
+_MONTHLY_LEAVE_QUERY = """
+    SELECT COALESCE(SUM(total_days), 0)::float8 as total
+    FROM leave_requests
+    WHERE emp_id = %s
+    AND start_date >= %s AND start_date < %s
+    AND status IN ('approved', 'pending')
+"""
+
+
+def _month_bounds(month: int, year: int) -> Tuple[date, date]:
+    """First day of the month and first day of the next month"""
+    first = date(year, month, 1)
+    next_first = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return first, next_first
+
+
+@with_db_retry
+def _fetch_monthly_leave_count(emp_id: str, month: int, year: int) -> Optional[Tuple]:
+    with get_db_connection() as conn, conn.cursor(row_factory=tuple_row) as cur:
+        cur.execute(_MONTHLY_LEAVE_QUERY, (emp_id, *_month_bounds(month, year)))
+        return cur.fetchone()
+
+
 def get_monthly_leave_count(emp_id: str, month: int, year: int) -> int:
     """Get number of leave days taken in a specific month"""
-    conn = get_db_connection()
-    if not conn:
+    try:
+        result = _context_lookup("monthly", (emp_id, month, year))
+        if result is _NOT_PREFETCHED:
+            result = _fetch_monthly_leave_count(emp_id, month, year)
+        return result[0] if result else 0
+    except Exception as e:
+        log.warning("Error getting monthly count: %s", e)
         return 0
+
+
+# ============================================================
+# EVALUATION CONTEXT
+# Everything the rule checks read from the DB for one request, fetched
+# in a single pipelined round-trip. While an evaluation is running the
+# helpers above answer from it instead of querying one by one.
+# ============================================================
+_NOT_PREFETCHED = object()
+_evaluation_context: ContextVar[Optional[Dict]] = ContextVar("evaluation_context", default=None)
+
+
+def _context_lookup(kind: str, key):
+    """Prefetched result for a helper call, or _NOT_PREFETCHED"""
+    context = _evaluation_context.get()
+    if context is None:
+        return _NOT_PREFETCHED
+    return context[kind].get(key, _NOT_PREFETCHED)
+
+
+@with_db_retry
+def _fetch_evaluation_context(emp_id: str, db_leave_type: str, start_date: str, end_date: str,
+                              month: int, year: int) -> Tuple:
+    with get_db_connection() as conn, conn.pipeline():
+        # Same queries as the individual helpers; the pipeline sends them together
+        employee_cur = conn.execute("""
+            SELECT e.*, e.department as team_name
+            FROM employees e
+            WHERE e.emp_id = %s
+        """, (emp_id,))
+        balance_cur = conn.cursor(row_factory=tuple_row).execute(
+            _BALANCE_QUERY, (emp_id, db_leave_type), binary=True)
+        team_cur = conn.cursor(row_factory=tuple_row).execute(
+            _TEAM_STATUS_QUERY, (None, emp_id, emp_id, start_date, end_date), binary=True)
+        monthly_cur = conn.cursor(row_factory=tuple_row).execute(
+            _MONTHLY_LEAVE_QUERY, (emp_id, *_month_bounds(month, year)))
+        
+        return (employee_cur.fetchone(), balance_cur.fetchone(),
+                _team_status_from_rows(team_cur.fetchall()), monthly_cur.fetchone())
+
+
+def fetch_evaluation_context(emp_id: str, leave_type: str, start_date: str, end_date: str) -> Optional[Dict]:
+    """
+    Load employee, balance, team status and monthly usage for one leave evaluation
+    in a single round-trip. Returns None on error (helpers then query individually).
+    """
+    db_leave_type = _balance_leave_type(leave_type)
+    start = parse_iso_datetime(start_date)
     
     try:
-        cur = conn.cursor(row_factory=dict_row)
-        cur.execute("""
-            SELECT COALESCE(SUM(total_days), 0) as total
-            FROM leave_requests
-            WHERE emp_id = %s
-            AND EXTRACT(MONTH FROM start_date) = %s
-            AND EXTRACT(YEAR FROM start_date) = %s
-            AND status IN ('approved', 'pending')
-        """, (emp_id, month, year))
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
-        return result['total'] if result else 0
+        employee, balance, team, monthly = _fetch_evaluation_context(
+            emp_id, db_leave_type, start_date, end_date, start.month, start.year)
     except Exception as e:
-        print(f"❌ Error getting monthly count: {e}")
-        if conn:
-            conn.close()
-        return 0
+        log.warning("Error prefetching evaluation context: %s", e)
+        return None
+    
+    if employee:
+        _employee_cache.set(emp_id, employee)
+    if balance:
+        _balance_cache.set((emp_id, db_leave_type), balance)
+    
+    return {
+        "employee": {emp_id: employee},
+        "balance": {(emp_id, db_leave_type): balance},
+        "team": {(emp_id, start_date, end_date): team},
+        "monthly": {(emp_id, start.month, start.year): monthly},
+    }
 
 
 # ============================================================
@@ -1083,22 +1669,40 @@ def get_monthly_leave_count(emp_id: str, month: int, year: int) -> int:
 # All functions now accept 'rules' parameter for dynamic rule configuration
 # ============================================================
 
-def check_rule001_max_duration(leave_info: Dict, rules: Dict = None) -> Dict:
+def rule_active(rule_id: str, rule_name: str):
+    """
+    Resolve a built-in rule before running its check.
+    The wrapped check keeps the public (..., rules=None) signature; the body
+    receives the rule's own config dict and only runs when the rule is active.
+    """
+    def decorator(check: Callable) -> Callable:
+        arity = check.__code__.co_argcount
+        # Constant per rule, so every disabled call shares one read-only result
+        skipped = MappingProxyType({"rule_id": rule_id, "rule_name": rule_name, "passed": True,
+                                    "skipped": True, "message": "Rule disabled"})
+
+        @functools.wraps(check)
+        def wrapper(*args, rules: Dict = None) -> Dict:
+            if len(args) == arity:
+                *args, rules = args
+            if rules is None:
+                rules = CONSTRAINT_RULES
+            rule = rules.get(rule_id, _MISSING_RULE)
+            if not rule.get("is_active", True):
+                return skipped
+            return check(*args, rule)
+        return wrapper
+    return decorator
+
+
+@rule_active("RULE001", "Maximum Leave Duration")
+def check_rule001_max_duration(leave_info: Dict, rule: Dict) -> Dict:
     """RULE001: Check maximum leave duration"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    # Check if rule is active
-    rule = rules.get("RULE001", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE001", "rule_name": "Maximum Leave Duration", "passed": True, 
-                "skipped": True, "message": "Rule disabled"}
-    
     leave_type = leave_info['leave_type']
     days = leave_info['days_requested']
     
-    # Get limits from config or flat structure
-    config = rule.get("config", rule)
+    # Rules are normalized, so config is always present
+    config = rule["config"]
     limits = config.get("limits", {})
     max_allowed = limits.get(leave_type, 20)
     
@@ -1119,16 +1723,9 @@ def check_rule001_max_duration(leave_info: Dict, rules: Dict = None) -> Dict:
     }
 
 
-def check_rule002_balance(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE002", "Leave Balance Check")
+def check_rule002_balance(emp_id: str, leave_info: Dict, rule: Dict) -> Dict:
     """RULE002: Check leave balance"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE002", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE002", "rule_name": "Leave Balance Check", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     leave_type = leave_info['leave_type']
     days = leave_info['days_requested']
     balance = get_leave_balance(emp_id, leave_type)
@@ -1150,23 +1747,16 @@ def check_rule002_balance(emp_id: str, leave_info: Dict, rules: Dict = None) ->
     }
 
 
-def check_rule003_team_coverage(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE003", "Minimum Team Coverage")
+def check_rule003_team_coverage(emp_id: str, leave_info: Dict, rule: Dict) -> Dict:
     """RULE003: Check minimum team coverage"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE003", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE003", "rule_name": "Minimum Team Coverage", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     team_status = get_team_status(emp_id, leave_info['start_date'], leave_info['end_date'])
     
     team_size = team_status['team_size']
     would_be_available = team_status['available']
     
     # Get min coverage from rule config
-    config = rule.get("config", rule)
+    config = rule["config"]
     min_coverage_percent = config.get("min_coverage_percent", 60)
     min_required = max(1, round(team_size * (min_coverage_percent / 100)))
     
@@ -1192,20 +1782,13 @@ def check_rule003_team_coverage(emp_id: str, leave_info: Dict, rules: Dict = Non
     }
 
 
-def check_rule004_concurrent_leave(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE004", "Maximum Concurrent Leave")
+def check_rule004_concurrent_leave(emp_id: str, leave_info: Dict, rule: Dict) -> Dict:
     """RULE004: Check maximum concurrent leaves"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE004", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE004", "rule_name": "Maximum Concurrent Leave", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     team_status = get_team_status(emp_id, leave_info['start_date'], leave_info['end_date'])
     
     would_be_on_leave = team_status['would_be_on_leave']
-    config = rule.get("config", rule)
+    config = rule["config"]
     max_concurrent = config.get("max_concurrent", 2)
     
     passed = would_be_on_leave <= max_concurrent
@@ -1225,16 +1808,9 @@ def check_rule004_concurrent_leave(emp_id: str, leave_info: Dict, rules: Dict =
     }
 
 
-def check_rule005_blackout(leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE005", "Blackout Period Check")
+def check_rule005_blackout(leave_info: Dict, rule: Dict) -> Dict:
     """RULE005: Check blackout dates"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE005", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE005", "rule_name": "Blackout Period Check", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     blackouts = get_blackout_dates(leave_info['start_date'], leave_info['end_date'])
     
     passed = len(blackouts) == 0
@@ -1255,22 +1831,14 @@ def check_rule005_blackout(leave_info: Dict, rules: Dict = None) -> Dict:
     }
 
 
-def check_rule006_notice(leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE006", "Advance Notice Requirement")
+def check_rule006_notice(leave_info: Dict, rule: Dict) -> Dict:
     """RULE006: Check advance notice requirement"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE006", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE006", "rule_name": "Advance Notice Requirement", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     leave_type = leave_info['leave_type']
-    start_date = datetime.strptime(leave_info['start_date'], "%Y-%m-%d")
-    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    start_date = parse_iso_datetime(leave_info['start_date']).date()
     
-    days_notice = (start_date - today).days
-    config = rule.get("config", rule)
+    days_notice = (start_date - date.today()).days
+    config = rule["config"]
     notice_days_map = config.get("notice_days", {})
     required_notice = notice_days_map.get(leave_type, 3)
     
@@ -1292,19 +1860,12 @@ def check_rule006_notice(leave_info: Dict, rules: Dict = None) -> Dict:
     }
 
 
-def check_rule007_consecutive(leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE007", "Consecutive Leave Limit")
+def check_rule007_consecutive(leave_info: Dict, rule: Dict) -> Dict:
     """RULE007: Check consecutive leave limit"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE007", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE007", "rule_name": "Consecutive Leave Limit", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
     leave_type = leave_info['leave_type']
     days = leave_info['days_requested']
-    config = rule.get("config", rule)
+    config = rule["config"]
     max_consecutive_map = config.get("max_consecutive", {})
     max_consecutive = max_consecutive_map.get(leave_type, 10)
     
@@ -1324,23 +1885,16 @@ def check_rule007_consecutive(leave_info: Dict, rules: Dict = None) -> Dict:
     }
 
 
-def check_rule013_monthly_quota(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+@rule_active("RULE013", "Monthly Leave Quota")
+def check_rule013_monthly_quota(emp_id: str, leave_info: Dict, rule: Dict) -> Dict:
     """RULE013: Check monthly leave quota"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE013", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE013", "rule_name": "Monthly Leave Quota", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
-    start_date = datetime.strptime(leave_info['start_date'], "%Y-%m-%d")
+    start_date = parse_iso_datetime(leave_info['start_date'])
     month = start_date.month
     year = start_date.year
     
     current_monthly = get_monthly_leave_count(emp_id, month, year)
     new_total = current_monthly + leave_info['days_requested']
-    config = rule.get("config", rule)
+    config = rule["config"]
     max_monthly = config.get("max_per_month", 5)
     
     passed = new_total <= max_monthly
@@ -1361,26 +1915,17 @@ def check_rule013_monthly_quota(emp_id: str, leave_info: Dict, rules: Dict = Non
     }
 
 
-def check_rule014_half_day(leave_info: Dict, rules: Dict = None) -> Dict:
+def is_half_day_request(leave_info: Dict) -> bool:
+    """Half-day flag set, 0.5 days requested, or a half-day leave type - cheapest test first"""
+    return bool(leave_info.get('is_half_day')
+                or leave_info.get('days_requested') == 0.5
+                or 'half' in leave_info.get('leave_type', '').lower())
+
+
+@rule_active("RULE014", "Half-Day Leave Escalation")
+def check_rule014_half_day(leave_info: Dict, rule: Dict) -> Dict:
     """RULE014: Half-day leaves ALWAYS require HR approval - never auto-approved"""
-    if rules is None:
-        rules = CONSTRAINT_RULES
-    
-    rule = rules.get("RULE014", {})
-    if not rule.get("is_active", True):
-        return {"rule_id": "RULE014", "rule_name": "Half-Day Leave Escalation", "passed": True,
-                "skipped": True, "message": "Rule disabled"}
-    
-    is_half_day = leave_info.get('is_half_day', False)
-    
-    # Also detect from leave_type name
-    leave_type_lower = leave_info.get('leave_type', '').lower()
-    if 'half' in leave_type_lower or 'half-day' in leave_type_lower:
-        is_half_day = True
-    
-    # Also detect from days_requested being 0.5
-    if leave_info.get('days_requested') == 0.5:
-        is_half_day = True
+    is_half_day = is_half_day_request(leave_info)
     
     # Half-day requests ALWAYS fail this rule to force escalation
     passed = not is_half_day
@@ -1436,245 +1981,451 @@ def evaluate_custom_rule(rule_id: str, rule_data: Dict, emp_id: str, leave_info:
         "custom_message": "...",            // custom error message
     }
     """
+    return compile_custom_rule(rule_id, rule_data)(emp_id, leave_info)
+
+
+# Generic threshold check: condition -> (comparison on days_requested, default failure message)
+_THRESHOLD_CONDITIONS = {
+    "greater_than": (operator.gt, "❌ {rule_name}: Exceeds threshold of {threshold}"),
+    "less_than": (operator.lt, "❌ {rule_name}: Below threshold of {threshold}"),
+    "equals": (operator.eq, "❌ {rule_name}: Cannot request exactly {threshold} days"),
+}
+
+
+# Custom rule config keys that must hold numbers / collections when present, per category:
+# only what that category's handler reads, so a stray key elsewhere can't disable the rule
+_CUSTOM_CATEGORY_CONFIG_KEYS = {
+    "limits": (("max_days", "min_days"), ()),
+    "blackout": ((), ("blocked_dates", "blocked_days")),
+    "notice": (("min_notice_days",), ()),
+    "coverage": (("min_team_available", "max_concurrent"), ()),
+    "eligibility": (("min_tenure_months",), ("allowed_departments", "blocked_departments")),
+    "escalation": (("escalate_above_days",), ()),
+    "documentation": (("require_above_days",), ()),
+}
+# Read for every category (the type filters)
+_CUSTOM_COMMON_COLLECTION_KEYS = ("applies_to_types", "excluded_types")
+
+
+def validate_custom_rule_config(config: Dict, category: str) -> Optional[str]:
+    """Describe the first malformed value the rule would read, or None if it is usable"""
+    if not isinstance(config, Mapping):
+        return "config must be an object"
+    numeric_keys, collection_keys = _CUSTOM_CATEGORY_CONFIG_KEYS.get(category, ((), ()))
+    condition = config.get("condition")
+    if isinstance(condition, str) and condition in _THRESHOLD_CONDITIONS:
+        # threshold is only compared when the condition is one we know
+        numeric_keys += ("threshold",)
+    for key in numeric_keys:
+        value = config.get(key)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float, Decimal))):
+            return f"{key} must be a number"
+    for key in _CUSTOM_COMMON_COLLECTION_KEYS + collection_keys:
+        value = config.get(key)
+        if value is not None and not isinstance(value, (list, tuple, set, frozenset)):
+            return f"{key} must be a list"
+    if category == "blackout" and not all(isinstance(day, str) for day in config.get("blocked_days") or ()):
+        return "blocked_days must contain day names"
+    return None
+
+
+def compile_custom_rule(rule_id: str, rule_data: Dict) -> Callable[[str, Dict, Dict], Dict]:
+    """
+    Specialize a custom rule into an evaluator (emp_id, leave_info, rules=None) -> check result.
+    rules is unused; it is accepted so custom and built-in checks share one call shape.
+    Everything that depends only on the rule (category handler, type filters, threshold
+    comparison and messages) is resolved here once instead of on every request.
+    """
     category = rule_data.get("category", "limits")
     config = rule_data.get("config", {})
     rule_name = rule_data.get("name", rule_id)
     is_blocking = rule_data.get("is_blocking", True)
+    handler = CUSTOM_CATEGORY_HANDLERS.get(category)
+    passed_message = f"✅ {rule_name}: Passed"
     
-    leave_type = leave_info.get("leave_type", "")
-    days_requested = leave_info.get("days_requested", 0)
-    start_date = leave_info.get("start_date", "")
-    end_date = leave_info.get("end_date", "")
-    
-    # Check if rule applies to this leave type
-    applies_to = config.get("applies_to_types", [])
-    excluded = config.get("excluded_types", [])
-    
-    if applies_to and leave_type not in applies_to:
+    # Malformed configs are reported once here and then answered without running the rule
+    problem = validate_custom_rule_config(config, category)
+    if problem:
+        log.warning("Custom rule %s has an invalid config: %s", rule_id, problem)
+        
+        def invalid(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+            return {
+                "rule_id": rule_id,
+                "rule_name": rule_name,
+                "passed": True,  # Don't block on evaluation errors
+                "is_blocking": is_blocking,
+                "is_custom": True,
+                "category": category,
+                "details": {"error": problem},
+                "message": f"⚠️ {rule_name}: Could not evaluate (error: {problem})"
+            }
+        return invalid
+    
+    # Leave type filters as sets; None when the rule has no filter. Leave types are strings,
+    # so other entries could never match.
+    applies_to = config.get("applies_to_types")
+    applies_to = frozenset(t for t in applies_to if isinstance(t, str)) if applies_to else None
+    excluded = config.get("excluded_types")
+    excluded = frozenset(t for t in excluded if isinstance(t, str)) if excluded else None
+    
+    # Blackout dates sorted and blocked weekdays as a bitmask, bound into the handler
+    if handler is _custom_blackout:
+        handler = functools.partial(_custom_blackout,
+                                    blocked_dates=_blocked_date_list(config.get("blocked_dates") or ()),
+                                    blocked_weekday_mask=_blocked_weekday_mask(config.get("blocked_days") or ()))
+    
+    threshold = config.get("threshold")
+    condition = config.get("condition")
+    threshold_check = None
+    if threshold is not None and isinstance(condition, str) and condition in _THRESHOLD_CONDITIONS:
+        compare, default_message = _THRESHOLD_CONDITIONS[condition]
+        threshold_check = (compare, config.get("custom_message",
+                                               default_message.format(rule_name=rule_name, threshold=threshold)))
+    
+    def check(emp_id: str, leave_info: Dict, rules: Dict = None) -> Dict:
+        leave_type = leave_info.get("leave_type", "")
+        
+        if applies_to is not None and leave_type not in applies_to:
+            return {
+                "rule_id": rule_id,
+                "rule_name": rule_name,
+                "passed": True,
+                "skipped": True,
+                "is_blocking": is_blocking,
+                "message": f"Rule not applicable to {leave_type}"
+            }
+        
+        if excluded is not None and leave_type in excluded:
+            return {
+                "rule_id": rule_id,
+                "rule_name": rule_name,
+                "passed": True,
+                "skipped": True,
+                "is_blocking": is_blocking,
+                "message": f"{leave_type} is exempt from this rule"
+            }
+        
+        passed = True
+        message = passed_message
+        details = {}
+        
+        try:
+            # Category-specific checks (unknown categories only get the generic threshold check)
+            if handler:
+                passed, category_message = handler(rule_name, config, emp_id, leave_info, details)
+                if category_message:
+                    message = category_message
+            
+            # Generic threshold check (works for any category)
+            if threshold_check:
+                compare, threshold_message = threshold_check
+                if compare(leave_info.get("days_requested", 0), threshold):
+                    passed = False
+                    message = threshold_message
+            
+        except Exception as e:
+            # Safety net only - configs are validated above, and try is free when nothing raises
+            log.warning("Error evaluating custom rule %s: %s", rule_id, e)
+            passed = True  # Don't block on evaluation errors
+            message = f"⚠️ {rule_name}: Could not evaluate (error: {str(e)})"
+            details["error"] = str(e)
+        
         return {
             "rule_id": rule_id,
             "rule_name": rule_name,
-            "passed": True,
-            "skipped": True,
+            "passed": passed,
             "is_blocking": is_blocking,
-            "message": f"Rule not applicable to {leave_type}"
+            "is_custom": True,
+            "category": category,
+            "details": details,
+            "message": message
         }
     
-    if excluded and leave_type in excluded:
-        return {
-            "rule_id": rule_id,
-            "rule_name": rule_name,
-            "passed": True,
-            "skipped": True,
-            "is_blocking": is_blocking,
-            "message": f"{leave_type} is exempt from this rule"
-        }
+    return check
+
+
+# ============================================================
+# CUSTOM RULE CATEGORY HANDLERS
+# Each takes (rule_name, config, emp_id, leave_info, details), may add to details,
+# and returns (passed, message) - message None keeps the default "Passed" message.
+# ============================================================
+
+def _custom_limits(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                   details: Dict) -> Tuple[bool, Optional[str]]:
+    """LIMITS - Max/min days, quotas"""
+    days_requested = leave_info.get("days_requested", 0)
+    max_days = config.get("max_days")
+    min_days = config.get("min_days")
+    passed, message = True, None
     
-    passed = True
-    message = f"✅ {rule_name}: Passed"
-    details = {}
+    if max_days is not None and days_requested > max_days:
+        passed = False
+        message = f"❌ {rule_name}: Exceeds maximum {max_days} days (requested: {days_requested})"
+        details["limit"] = max_days
+        details["requested"] = days_requested
     
-    try:
-        # ============================================================
-        # CATEGORY: LIMITS - Max/min days, quotas
-        # ============================================================
-        if category == "limits":
-            max_days = config.get("max_days")
-            min_days = config.get("min_days")
-            
-            if max_days is not None and days_requested > max_days:
-                passed = False
-                message = f"❌ {rule_name}: Exceeds maximum {max_days} days (requested: {days_requested})"
-                details["limit"] = max_days
-                details["requested"] = days_requested
-            
-            if min_days is not None and days_requested < min_days:
-                passed = False
-                message = f"❌ {rule_name}: Below minimum {min_days} days (requested: {days_requested})"
-                details["minimum"] = min_days
-                details["requested"] = days_requested
-        
-        # ============================================================
-        # CATEGORY: BLACKOUT - Date-based restrictions
-        # ============================================================
-        elif category == "blackout":
-            blocked_dates = config.get("blocked_dates", [])
-            blocked_days = config.get("blocked_days", [])  # ["friday", "saturday"]
-            
-            if start_date:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                end_dt = datetime.strptime(end_date, "%Y-%m-%d") if end_date else start_dt
-                
-                # Check specific blocked dates
-                current = start_dt
-                while current <= end_dt:
-                    date_str = current.strftime("%Y-%m-%d")
-                    if date_str in blocked_dates:
-                        passed = False
-                        message = f"❌ {rule_name}: {date_str} is blocked"
-                        details["blocked_date"] = date_str
-                        break
-                    
-                    # Check blocked days of week
-                    day_name = current.strftime("%A").lower()
-                    if day_name in [d.lower() for d in blocked_days]:
-                        passed = False
-                        message = f"❌ {rule_name}: {day_name.title()} is not allowed"
-                        details["blocked_day"] = day_name
-                        break
-                    
-                    current += timedelta(days=1)
-        
-        # ============================================================
-        # CATEGORY: NOTICE - Advance notice requirements
-        # ============================================================
-        elif category == "notice":
-            min_notice_days = config.get("min_notice_days", 0)
-            
-            if start_date and min_notice_days > 0:
-                start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                notice_given = (start_dt - today).days
-                
-                if notice_given < min_notice_days:
-                    passed = False
-                    message = f"❌ {rule_name}: Requires {min_notice_days} days notice (given: {notice_given})"
-                    details["required_notice"] = min_notice_days
-                    details["actual_notice"] = notice_given
-        
-        # ============================================================
-        # CATEGORY: COVERAGE - Team coverage requirements
-        # ============================================================
-        elif category == "coverage":
-            min_available = config.get("min_team_available")
-            max_concurrent = config.get("max_concurrent")
-            
-            if min_available or max_concurrent:
-                team_status = get_team_status(emp_id, start_date, end_date)
-                available_after = team_status.get("available", 0)
-                on_leave = team_status.get("on_leave", 0)
-                
-                if min_available and available_after < min_available:
-                    passed = False
-                    message = f"❌ {rule_name}: Minimum {min_available} team members must be available (would be: {available_after})"
-                    details["min_required"] = min_available
-                    details["would_be_available"] = available_after
-                
-                if max_concurrent and (on_leave + 1) > max_concurrent:
-                    passed = False
-                    message = f"❌ {rule_name}: Maximum {max_concurrent} concurrent leaves allowed (would be: {on_leave + 1})"
-                    details["max_concurrent"] = max_concurrent
-                    details["would_be_on_leave"] = on_leave + 1
+    if min_days is not None and days_requested < min_days:
+        passed = False
+        message = f"❌ {rule_name}: Below minimum {min_days} days (requested: {days_requested})"
+        details["minimum"] = min_days
+        details["requested"] = days_requested
+    
+    return passed, message
+
+
+def _blocked_date_list(blocked_dates) -> Tuple[date, ...]:
+    """A blackout rule's blocked dates, parsed and sorted; only exact "YYYY-MM-DD" entries count"""
+    parsed = []
+    for value in blocked_dates:
+        try:
+            blocked = date.fromisoformat(value)
+        except (TypeError, ValueError):
+            continue
+        if blocked.isoformat() == value:
+            parsed.append(blocked)
+    return tuple(sorted(parsed))
+
+
+def _blocked_weekday_mask(blocked_days) -> int:
+    """Blocked day names (full or short) as a Monday=bit 0 weekday mask"""
+    mask = 0
+    for day in blocked_days:
+        weekday = _WEEKDAY_NUMBERS.get(day.lower())
+        if weekday is not None:
+            mask |= 1 << weekday
+    return mask
+
+
+def _custom_blackout(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                     details: Dict, *, blocked_dates: Tuple[date, ...] = None,
+                     blocked_weekday_mask: int = None) -> Tuple[bool, Optional[str]]:
+    """
+    BLACKOUT - Date-based restrictions.
+    compile_custom_rule binds blocked_dates/blocked_weekday_mask, parsed once from the config;
+    direct callers can leave them out.
+    """
+    if blocked_dates is None:
+        blocked_dates = _blocked_date_list(config.get("blocked_dates") or ())
+    if blocked_weekday_mask is None:
+        blocked_weekday_mask = _blocked_weekday_mask(config.get("blocked_days") or ())  # ["friday", "saturday"]
+    start_date = leave_info.get("start_date", "")
+    end_date = leave_info.get("end_date", "")
+    
+    if not start_date:
+        return True, None
+    
+    start_day = parse_iso_datetime(start_date).date()
+    end_day = parse_iso_datetime(end_date).date() if end_date else start_day
+    
+    span = (end_day - start_day).days
+    
+    # Earliest blocked date inside the range
+    first_blocked_date = next(
+        (blocked for blocked in blocked_dates if start_day <= blocked <= end_day), None)
+    
+    # Earliest blocked day of week
+    first_blocked_weekday = None
+    if blocked_weekday_mask:
+        start_weekday = start_day.weekday()
+        offset = min((weekday - start_weekday) % 7 for weekday in range(7) if blocked_weekday_mask >> weekday & 1)
+        if offset <= span:
+            first_blocked_weekday = start_day + timedelta(days=offset)
+    
+    # Report whichever comes first; a blocked date wins over a blocked weekday on the same day
+    if first_blocked_date is not None and (first_blocked_weekday is None or first_blocked_date <= first_blocked_weekday):
+        date_str = first_blocked_date.isoformat()
+        details["blocked_date"] = date_str
+        return False, f"❌ {rule_name}: {date_str} is blocked"
+    if first_blocked_weekday is not None:
+        day_name = _WEEKDAY_NAMES[first_blocked_weekday.weekday()]
+        details["blocked_day"] = day_name
+        return False, f"❌ {rule_name}: {day_name.title()} is not allowed"
+    
+    return True, None
+
+
+def _custom_notice(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                   details: Dict) -> Tuple[bool, Optional[str]]:
+    """NOTICE - Advance notice requirements"""
+    start_date = leave_info.get("start_date", "")
+    min_notice_days = config.get("min_notice_days") or 0  # null in the stored JSON means no requirement
+    
+    if start_date and min_notice_days > 0:
+        notice_given = (parse_iso_datetime(start_date).date() - date.today()).days
         
-        # ============================================================
-        # CATEGORY: ELIGIBILITY - Who can take leave
-        # ============================================================
-        elif category == "eligibility":
-            min_tenure_months = config.get("min_tenure_months")
-            allowed_departments = config.get("allowed_departments", [])
-            blocked_departments = config.get("blocked_departments", [])
-            
-            employee = get_employee_info(emp_id)
-            if employee:
-                dept = employee.get("department", "")
-                
-                if allowed_departments and dept not in allowed_departments:
-                    passed = False
-                    message = f"❌ {rule_name}: Not available for {dept} department"
-                    details["department"] = dept
-                
-                if blocked_departments and dept in blocked_departments:
-                    passed = False
-                    message = f"❌ {rule_name}: Blocked for {dept} department"
-                    details["department"] = dept
-                
-                if min_tenure_months:
-                    join_date = employee.get("join_date")
-                    if join_date:
-                        if isinstance(join_date, str):
-                            join_dt = datetime.strptime(join_date[:10], "%Y-%m-%d")
-                        else:
-                            join_dt = join_date
-                        months_employed = (datetime.now() - join_dt).days / 30
-                        if months_employed < min_tenure_months:
-                            passed = False
-                            message = f"❌ {rule_name}: Requires {min_tenure_months} months tenure (current: {int(months_employed)})"
-                            details["required_months"] = min_tenure_months
-                            details["current_months"] = int(months_employed)
+        if notice_given < min_notice_days:
+            details["required_notice"] = min_notice_days
+            details["actual_notice"] = notice_given
+            return False, f"❌ {rule_name}: Requires {min_notice_days} days notice (given: {notice_given})"
+    
+    return True, None
+
+
+def _custom_coverage(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                     details: Dict) -> Tuple[bool, Optional[str]]:
+    """COVERAGE - Team coverage requirements"""
+    min_available = config.get("min_team_available")
+    max_concurrent = config.get("max_concurrent")
+    passed, message = True, None
+    
+    if min_available or max_concurrent:
+        team_status = get_team_status(emp_id, leave_info.get("start_date", ""), leave_info.get("end_date", ""))
+        available_after = team_status.get("available", 0)
+        on_leave = team_status.get("on_leave", 0)
         
-        # ============================================================
-        # CATEGORY: ESCALATION - Always escalate for review
-        # ============================================================
-        elif category == "escalation":
-            escalate_always = config.get("escalate_always", False)
-            escalate_above_days = config.get("escalate_above_days")
-            
-            if escalate_always:
-                passed = False
-                message = f"⚠️ {rule_name}: Requires manual review"
-                details["escalation_reason"] = "Always requires review"
-            
-            if escalate_above_days and days_requested > escalate_above_days:
-                passed = False
-                message = f"⚠️ {rule_name}: Leaves over {escalate_above_days} days require review"
-                details["threshold_days"] = escalate_above_days
-                details["requested_days"] = days_requested
+        if min_available and available_after < min_available:
+            passed = False
+            message = f"❌ {rule_name}: Minimum {min_available} team members must be available (would be: {available_after})"
+            details["min_required"] = min_available
+            details["would_be_available"] = available_after
         
-        # ============================================================
-        # CATEGORY: DOCUMENTATION - Document requirements
-        # ============================================================
-        elif category == "documentation":
-            require_doc_above_days = config.get("require_above_days")
-            always_require = config.get("always_require", False)
-            
-            # Note: We can't actually check if docs are attached here,
-            # but we can flag that docs are required
-            if always_require or (require_doc_above_days and days_requested > require_doc_above_days):
-                details["documents_required"] = True
-                details["requirement_reason"] = "Always required" if always_require else f"Required for leaves over {require_doc_above_days} days"
-                # Don't fail the check, just add to details
-                message = f"ℹ️ {rule_name}: Supporting documents required"
+        if max_concurrent and (on_leave + 1) > max_concurrent:
+            passed = False
+            message = f"❌ {rule_name}: Maximum {max_concurrent} concurrent leaves allowed (would be: {on_leave + 1})"
+            details["max_concurrent"] = max_concurrent
+            details["would_be_on_leave"] = on_leave + 1
+    
+    return passed, message
+
+
+def _custom_eligibility(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                        details: Dict) -> Tuple[bool, Optional[str]]:
+    """ELIGIBILITY - Who can take leave"""
+    min_tenure_months = config.get("min_tenure_months")
+    allowed_departments = config.get("allowed_departments", [])
+    blocked_departments = config.get("blocked_departments", [])
+    passed, message = True, None
+    
+    employee = get_employee_info(emp_id)
+    if employee:
+        dept = employee.get("department", "")
         
-        # ============================================================
-        # GENERIC THRESHOLD CHECK (works for any category)
-        # ============================================================
-        threshold = config.get("threshold")
-        condition = config.get("condition")
+        if allowed_departments and dept not in allowed_departments:
+            passed = False
+            message = f"❌ {rule_name}: Not available for {dept} department"
+            details["department"] = dept
         
-        if threshold is not None and condition:
-            if condition == "greater_than" and days_requested > threshold:
-                passed = False
-                message = config.get("custom_message", f"❌ {rule_name}: Exceeds threshold of {threshold}")
-            elif condition == "less_than" and days_requested < threshold:
-                passed = False
-                message = config.get("custom_message", f"❌ {rule_name}: Below threshold of {threshold}")
-            elif condition == "equals" and days_requested == threshold:
-                passed = False
-                message = config.get("custom_message", f"❌ {rule_name}: Cannot request exactly {threshold} days")
+        if blocked_departments and dept in blocked_departments:
+            passed = False
+            message = f"❌ {rule_name}: Blocked for {dept} department"
+            details["department"] = dept
         
-    except Exception as e:
-        print(f"⚠️ Error evaluating custom rule {rule_id}: {e}", file=sys.stderr)
-        passed = True  # Don't block on evaluation errors
-        message = f"⚠️ {rule_name}: Could not evaluate (error: {str(e)})"
-        details["error"] = str(e)
+        if min_tenure_months:
+            # employees stores this as hire_date; join_date kept for callers passing their own dicts
+            join_date = employee.get("join_date") or employee.get("hire_date")
+            if join_date:
+                if isinstance(join_date, str):
+                    join_dt = datetime.fromisoformat(join_date[:10])
+                else:
+                    join_dt = join_date
+                months_employed = (datetime.now() - join_dt).days / 30
+                if months_employed < min_tenure_months:
+                    passed = False
+                    message = f"❌ {rule_name}: Requires {min_tenure_months} months tenure (current: {int(months_employed)})"
+                    details["required_months"] = min_tenure_months
+                    details["current_months"] = int(months_employed)
     
-    return {
-        "rule_id": rule_id,
-        "rule_name": rule_name,
-        "passed": passed,
-        "is_blocking": is_blocking,
-        "is_custom": True,
-        "category": category,
-        "details": details,
-        "message": message
-    }
+    return passed, message
+
+
+def _custom_escalation(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                       details: Dict) -> Tuple[bool, Optional[str]]:
+    """ESCALATION - Always escalate for review"""
+    days_requested = leave_info.get("days_requested", 0)
+    escalate_always = config.get("escalate_always", False)
+    escalate_above_days = config.get("escalate_above_days")
+    passed, message = True, None
+    
+    if escalate_always:
+        passed = False
+        message = f"⚠️ {rule_name}: Requires manual review"
+        details["escalation_reason"] = "Always requires review"
+    
+    if escalate_above_days and days_requested > escalate_above_days:
+        passed = False
+        message = f"⚠️ {rule_name}: Leaves over {escalate_above_days} days require review"
+        details["threshold_days"] = escalate_above_days
+        details["requested_days"] = days_requested
+    
+    return passed, message
+
+
+def _custom_documentation(rule_name: str, config: Dict, emp_id: str, leave_info: Dict,
+                          details: Dict) -> Tuple[bool, Optional[str]]:
+    """DOCUMENTATION - Document requirements"""
+    days_requested = leave_info.get("days_requested", 0)
+    require_doc_above_days = config.get("require_above_days")
+    always_require = config.get("always_require", False)
+    
+    # Note: We can't actually check if docs are attached here,
+    # but we can flag that docs are required
+    if always_require or (require_doc_above_days and days_requested > require_doc_above_days):
+        details["documents_required"] = True
+        details["requirement_reason"] = "Always required" if always_require else f"Required for leaves over {require_doc_above_days} days"
+        # Don't fail the check, just add to details
+        return True, f"ℹ️ {rule_name}: Supporting documents required"
+    
+    return True, None
+
+
+CUSTOM_CATEGORY_HANDLERS = {
+    "limits": _custom_limits,
+    "blackout": _custom_blackout,
+    "notice": _custom_notice,
+    "coverage": _custom_coverage,
+    "eligibility": _custom_eligibility,
+    "escalation": _custom_escalation,
+    "documentation": _custom_documentation,
+}
 
 
 # ============================================================
 # MAIN CONSTRAINT ENGINE - NOW FULLY DYNAMIC
 # ============================================================
 
-def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None) -> Dict:
+# Built-in rule checks, dispatched by rule_id: (emp_id, leave_info, rules) -> result
+BUILTIN_RULE_CHECKS = {
+    "RULE001": lambda emp_id, leave_info, rules: check_rule001_max_duration(leave_info, rules),
+    "RULE002": check_rule002_balance,
+    "RULE003": check_rule003_team_coverage,
+    "RULE004": check_rule004_concurrent_leave,
+    "RULE005": lambda emp_id, leave_info, rules: check_rule005_blackout(leave_info, rules),
+    "RULE006": lambda emp_id, leave_info, rules: check_rule006_notice(leave_info, rules),
+    "RULE007": lambda emp_id, leave_info, rules: check_rule007_consecutive(leave_info, rules),
+    "RULE013": check_rule013_monthly_quota,
+    "RULE014": lambda emp_id, leave_info, rules: check_rule014_half_day(leave_info, rules),
+}
+
+# One bundle shared by every org without custom rules - never copied
+DEFAULT_RULES_BUNDLE = build_rules_bundle(DEFAULT_CONSTRAINT_RULES)
+
+# Test DB connection on startup
+test_db_connection()
+
+# Warm the org rules cache in the background (runs in each worker, as this module is imported per worker).
+# Started only once the rule checks above are defined, since building a bundle resolves them.
+if RULES_CACHE_WARM:
+    threading.Thread(target=warm_org_rules_cache, name="rules-cache-warm", daemon=True).start()
+
+
+def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None,
+                             stop_on_blocking: bool = False) -> Dict:
+    """
+    Evaluate all active constraint rules for a leave request.
+    The employee/balance/team/monthly reads are prefetched in one round-trip
+    and served to the rule checks from the evaluation context.
+    """
+    context = fetch_evaluation_context(emp_id, leave_info['leave_type'],
+                                       leave_info['start_date'], leave_info['end_date'])
+    token = _evaluation_context.set(context)
+    try:
+        return _evaluate_all_constraints(emp_id, leave_info, org_id, stop_on_blocking)
+    finally:
+        _evaluation_context.reset(token)
+
+
+def _evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None,
+                              stop_on_blocking: bool = False) -> Dict:
     """
     Evaluate all active constraint rules for a leave request.
     
@@ -1682,71 +2433,42 @@ def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None)
         emp_id: Employee ID
         leave_info: Leave request details
         org_id: Organization ID (optional - fetches org-specific rules if provided)
+        stop_on_blocking: Stop at the first blocking violation (blocking rules run first)
     
     Returns:
         Complete evaluation result with all constraint checks
     """
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()  # monotonic, unaffected by wall-clock adjustments
     results = []
     violations = []
     warnings = []
     passed_rules = []
     skipped_rules = []
     
+    # Looked up once: picks the org when none is given and fills the response below
+    employee = get_employee_info(emp_id)
+
     # Get organization-specific rules or defaults
+    org_id = org_id or (employee and employee.get('org_id'))
     if org_id:
-        rules = get_org_constraint_rules(org_id)
-        print(f"📋 Using {len(rules)} rules for org: {org_id}", file=sys.stderr)
+        bundle = get_org_rules_bundle(org_id)
+        log.debug("Using %d rules for org: %s", len(bundle.by_id), org_id)
     else:
-        # Try to get org_id from employee
-        employee = get_employee_info(emp_id)
-        if employee and employee.get('org_id'):
-            rules = get_org_constraint_rules(employee['org_id'])
-        else:
-            rules = DEFAULT_CONSTRAINT_RULES
-            print(f"⚠️ No org_id, using default rules", file=sys.stderr)
+        bundle = DEFAULT_RULES_BUNDLE
+        log.debug("No org_id, using default rules")
+    rules = bundle.by_id
 
     # Ensure leave_info has all necessary fields
     if 'days_requested' not in leave_info:
         # Calculate if missing
-        start = datetime.strptime(leave_info['start_date'], "%Y-%m-%d")
-        end = datetime.strptime(leave_info['end_date'], "%Y-%m-%d")
+        start = parse_iso_datetime(leave_info['start_date'])
+        end = parse_iso_datetime(leave_info['end_date'])
         leave_info['days_requested'] = (end - start).days + 1
 
-    # Run all checks - passing the rules dict to each function
-    # Only run checks for rules that exist in the rules dict
-    checks = []
-    
-    if "RULE001" in rules:
-        checks.append(check_rule001_max_duration(leave_info, rules))
-    if "RULE002" in rules:
-        checks.append(check_rule002_balance(emp_id, leave_info, rules))
-    if "RULE003" in rules:
-        checks.append(check_rule003_team_coverage(emp_id, leave_info, rules))
-    if "RULE004" in rules:
-        checks.append(check_rule004_concurrent_leave(emp_id, leave_info, rules))
-    if "RULE005" in rules:
-        checks.append(check_rule005_blackout(leave_info, rules))
-    if "RULE006" in rules:
-        checks.append(check_rule006_notice(leave_info, rules))
-    if "RULE007" in rules:
-        checks.append(check_rule007_consecutive(leave_info, rules))
-    if "RULE013" in rules:
-        checks.append(check_rule013_monthly_quota(emp_id, leave_info, rules))
-    if "RULE014" in rules:
-        checks.append(check_rule014_half_day(leave_info, rules))
-    
-    # ============================================================
-    # DYNAMIC CUSTOM RULE EVALUATION
-    # Evaluate any rule starting with "CUSTOM" using category-based logic
-    # ============================================================
-    for rule_id, rule_data in rules.items():
-        if rule_id.startswith("CUSTOM") and rule_data.get("is_active", True):
-            custom_result = evaluate_custom_rule(rule_id, rule_data, emp_id, leave_info, rules)
-            checks.append(custom_result)
-    
-    # Process results
-    for check in checks:
+    # Run checks blocking-first, cheapest first - passing the rules dict to each function.
+    # bundle.checks already holds the resolved built-in and compiled CUSTOM checks.
+    for rule_id, check_fn in bundle.checks:
+        check = check_fn(emp_id, leave_info, rules)
         results.append(check)
         
         # Handle skipped rules
@@ -1758,20 +2480,25 @@ def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None)
             # Check if this is a blocking violation or just a warning
             if check.get('is_blocking', True):
                 violations.append(check)
+                if stop_on_blocking:
+                    break
             else:
                 warnings.append(check)
         else:
             passed_rules.append(check['rule_id'])
             
-    processing_time = (datetime.now() - start_time).total_seconds() * 1000
+    processing_time = (time.perf_counter_ns() - start_ns) / 1e6
     
     # Determine outcome: Only blocking violations prevent approval
     all_passed = len(violations) == 0
     
-    # Get employee info for response
-    employee = get_employee_info(emp_id)
-    team_status = get_team_status(emp_id, leave_info['start_date'], leave_info['end_date'])
+    # Get team and balance info for response
+    team_status = get_team_status(emp_id, leave_info['start_date'], leave_info['end_date'],
+                                  department=employee.get('department') if employee else None)
     balance = get_leave_balance(emp_id, leave_info['leave_type'])
+    days_requested = leave_info['days_requested']
+    team_size = team_status.get('team_size')
+    available = team_status.get('available')
     
     return {
         "approved": all_passed,
@@ -1789,19 +2516,19 @@ def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None)
             "type": leave_info['leave_type'],
             "start_date": leave_info['start_date'],
             "end_date": leave_info['end_date'],
-            "days_requested": leave_info['days_requested'],
+            "days_requested": days_requested,
             # "original_text": leave_info.get('original_text', '') # Optional if not present
         },
         "balance": {
             "current": balance,
-            "after_approval": balance - leave_info['days_requested'] if all_passed else balance
+            "after_approval": balance - days_requested if all_passed else balance
         },
         "team_status": {
             "team_name": team_status.get('team_name'),
-            "team_size": team_status.get('team_size'),
+            "team_size": team_size,
             "currently_on_leave": team_status.get('on_leave'),
-            "would_be_available": team_status.get('available'),
-            "coverage_percent": round((team_status.get('available', 0) / team_status.get('team_size', 1)) * 100) if team_status.get('team_size') else 0
+            "would_be_available": available,
+            "coverage_percent": round(((available or 0) / team_size) * 100) if team_size else 0
         },
         "constraint_results": {
             "total_rules": len(results),
@@ -1824,69 +2551,70 @@ def evaluate_all_constraints(emp_id: str, leave_info: Dict, org_id: str = None)
     }
 
 
+# Suggestions per violated rule, built from the violation's details
+RULE_SUGGESTIONS: Dict[str, Callable[[Dict], Tuple[str, ...]]] = {
+    "RULE001": lambda details: (
+        f"💡 Try requesting {details.get('max_allowed', 10)} days or less",
+        "💡 Consider splitting into multiple shorter leaves",
+    ),
+    "RULE002": lambda details: (
+        f"💡 You have {details.get('current_balance', 0)} days available - try requesting fewer days",
+        "💡 Consider using a different leave type if available",
+    ),
+    "RULE003": lambda details: (
+        "💡 Try different dates when more team members are available",
+        "💡 Coordinate with team members to ensure coverage",
+        "💡 Consider work-from-home option for some days",
+    ),
+    "RULE004": lambda details: (
+        "💡 Wait for current leaves to end before requesting",
+        "💡 Try dates when fewer team members are on leave",
+    ),
+    "RULE005": lambda details: (
+        "💡 Choose dates outside the blackout period",
+        "💡 Contact HR for emergency exceptions",
+    ),
+    "RULE006": lambda details: (
+        f"💡 Plan {details.get('days_required', 7)}+ days in advance for this leave type",
+        "💡 For emergencies, use Emergency Leave type",
+    ),
+    "RULE007": lambda details: (
+        f"💡 Maximum {details.get('max_consecutive', 10)} consecutive days allowed - split your leave",
+        "💡 Take a break between leave periods",
+    ),
+    "RULE013": lambda details: (
+        "💡 Wait until next month when quota resets",
+        "💡 Contact HR for special circumstances",
+    ),
+}
+
+
 def generate_suggestions(violations: List[Dict], leave_info: Dict) -> List[str]:
     """Generate helpful suggestions based on violations"""
     suggestions = []
     
     for v in violations:
-        rule_id = v['rule_id']
-        
-        if rule_id == "RULE001":
-            max_days = v['details'].get('max_allowed', 10)
-            suggestions.append(f"💡 Try requesting {max_days} days or less")
-            suggestions.append("💡 Consider splitting into multiple shorter leaves")
-        
-        elif rule_id == "RULE002":
-            balance = v['details'].get('current_balance', 0)
-            suggestions.append(f"💡 You have {balance} days available - try requesting fewer days")
-            suggestions.append("💡 Consider using a different leave type if available")
-        
-        elif rule_id == "RULE003":
-            suggestions.append("💡 Try different dates when more team members are available")
-            suggestions.append("💡 Coordinate with team members to ensure coverage")
-            suggestions.append("💡 Consider work-from-home option for some days")
-        
-        elif rule_id == "RULE004":
-            suggestions.append("💡 Wait for current leaves to end before requesting")
-            suggestions.append("💡 Try dates when fewer team members are on leave")
-        
-        elif rule_id == "RULE005":
-            suggestions.append("💡 Choose dates outside the blackout period")
-            suggestions.append("💡 Contact HR for emergency exceptions")
-        
-        elif rule_id == "RULE006":
-            required = v['details'].get('days_required', 7)
-            suggestions.append(f"💡 Plan {required}+ days in advance for this leave type")
-            suggestions.append("💡 For emergencies, use Emergency Leave type")
-        
-        elif rule_id == "RULE007":
-            max_consec = v['details'].get('max_consecutive', 10)
-            suggestions.append(f"💡 Maximum {max_consec} consecutive days allowed - split your leave")
-            suggestions.append("💡 Take a break between leave periods")
-        
-        elif rule_id == "RULE013":
-            suggestions.append("💡 Wait until next month when quota resets")
-            suggestions.append("💡 Contact HR for special circumstances")
+        suggest = RULE_SUGGESTIONS.get(v['rule_id'])
+        if suggest:
+            suggestions.extend(suggest(v['details']))
     
-    return list(set(suggestions))[:5]  # Return max 5 unique suggestions
+    return list(dict.fromkeys(suggestions))[:5]  # Return max 5 unique suggestions, first seen first
 
 
 # ============================================================
 # API ENDPOINTS
 # ============================================================
 
-def save_leave_request(emp_id: str, leave_info: Dict, result: Dict) -> Optional[str]:
-    """Save the analyzed leave request to the database"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
+def save_leave_request(emp_id: str, leave_info: Dict, result: Dict, request_id: str = None,
+                       analysis_json: str = None) -> Optional[str]:
+    """
+    Save the analyzed leave request to the database.
+    Callers that already serialized the result (e.g. for the response) pass it as
+    analysis_json, with the request_id it was serialized with, to skip a second encode.
+    """
     try:
-        cur = conn.cursor(row_factory=dict_row)
-        
-        # 1. Get Employee Details (Country Code)
-        cur.execute("SELECT country_code FROM employees WHERE emp_id = %s", (emp_id,))
-        emp = cur.fetchone()
+        # 1. Get Employee Details (Country Code) - normally cached by the evaluation
+        emp = get_employee_info(emp_id)
         country_code = emp['country_code'] if emp else 'IN'
         
         # 2. Prepare Data
@@ -1897,17 +2625,16 @@ def save_leave_request(emp_id: str, leave_info: Dict, result: Dict) -> Optional[
         days = leave_info.get('days_requested', 1)
         
         if not (start and end):
-            print("❌ Cannot save request: Missing dates")
+            log.warning("Cannot save request: Missing dates")
             return None
-            
-        request_id = str(uuid.uuid4())
+        
+        request_id = request_id or str(uuid.uuid4())
         # Map boolean approved to enum status
         status = "approved" if result['approved'] else "escalated"
         # Map boolean approved to enum recommendation
         ai_rec = "approve" if result['approved'] else "escalate"
         
         # 3. Insert Leave Request
-        # Note: Using NOW() for dates if python datetime causes issues,        # 3. Insert Leave Request
         query = """
             INSERT INTO leave_requests (
                 request_id, emp_id, country_code, leave_type, 
@@ -1925,71 +2652,61 @@ def save_leave_request(emp_id: str, leave_info: Dict, result: Dict) -> Optional[
         """
         
         # Map readable leave type to db key for balance update
-        leave_type_map = {
-            "Annual Leave": "vacation",
-            "Sick Leave": "sick",
-            "Emergency Leave": "emergency",
-            "Personal Leave": "personal",
-            "Maternity Leave": "maternity",
-            "Paternity Leave": "paternity",
-            "Bereavement Leave": "bereavement",
-            "Study Leave": "study"
-        }
-        db_leave_type = leave_type_map.get(leave_type, "vacation")
-        
-        cur.execute(query, (
-            request_id,
-            emp_id,
-            country_code,
-            leave_info['leave_type'],
-            leave_info['start_date'],
-            leave_info['end_date'],
-            leave_info['days_requested'],
-            leave_info['days_requested'], # Assuming working days = total days for now
-            False, # is_half_day
-            leave_info.get('original_text', 'AI Request'), # Reason
-            status,
-            ai_rec,
-            1.0 if result['approved'] else 0.8, # Confidence
-            json.dumps(result), # Store full analysis
-        ))
+        db_leave_type = BALANCE_LEAVE_TYPE_MAP.get(leave_type, "vacation")
         
-        # 4. Update Balance (Atomic Update)
-        # If Approved -> Increment Used
-        # If Escalated -> Increment Pending
-        # We assume ensure_leave_balance was called during analysis, so record exists.
-        
-        if status == 'approved':
-            cur.execute("""
-                UPDATE leave_balances 
-                SET used_days = used_days + %s 
-                WHERE emp_id = %s AND leave_type = %s
-            """, (days, emp_id, db_leave_type))
-            if cur.rowcount == 0:
-                print(f"⚠️ WARNING: No balance updated! Check if leave_type='{db_leave_type}' exists for employee.")
-            else:
-                print(f"📉 Deducted {days} days from {db_leave_type} (Auto-Approved). Rows updated: {cur.rowcount}")
+        # The INSERT and the balance UPDATE don't depend on each other's results,
+        # so the pipeline sends both before waiting for either reply
+        with get_db_connection() as conn, conn.pipeline():
+            conn.execute(query, (
+                request_id,
+                emp_id,
+                country_code,
+                leave_info['leave_type'],
+                leave_info['start_date'],
+                leave_info['end_date'],
+                leave_info['days_requested'],
+                leave_info['days_requested'], # Assuming working days = total days for now
+                False, # is_half_day
+                leave_info.get('original_text', 'AI Request'), # Reason
+                status,
+                ai_rec,
+                1.0 if result['approved'] else 0.8, # Confidence
+                analysis_json or dumps_json(result), # Store full analysis
+            ))
             
-        elif status == 'escalated':
-            cur.execute("""
-                UPDATE leave_balances 
-                SET pending_days = COALESCE(pending_days, 0) + %s 
-                WHERE emp_id = %s AND leave_type = %s
-            """, (days, emp_id, db_leave_type))
-            if cur.rowcount == 0:
-                print(f"⚠️ WARNING: No pending balance updated! Check if leave_type='{db_leave_type}' exists.")
+            # 4. Update Balance (Atomic Update)
+            # If Approved -> Increment Used
+            # If Escalated -> Increment Pending
+            # We assume ensure_leave_balance was called during analysis, so record exists.
+            if status == 'approved':
+                balance_cur = conn.execute("""
+                    UPDATE leave_balances 
+                    SET used_days = used_days + %s 
+                    WHERE emp_id = %s AND leave_type = %s
+                """, (days, emp_id, db_leave_type))
             else:
-                print(f"⏳ Reserved {days} days from {db_leave_type} (Escalated). Rows updated: {cur.rowcount}")
+                balance_cur = conn.execute("""
+                    UPDATE leave_balances 
+                    SET pending_days = COALESCE(pending_days, 0) + %s 
+                    WHERE emp_id = %s AND leave_type = %s
+                """, (days, emp_id, db_leave_type))
+        
+        # Row counts are known once the pipeline has synced
+        if balance_cur.rowcount == 0:
+            log.warning("No %sbalance updated! Check if leave_type='%s' exists for employee %s",
+                        "" if status == 'approved' else "pending ", db_leave_type, emp_id)
+        elif status == 'approved':
+            log.debug("Deducted %s days from %s (Auto-Approved). Rows updated: %d", days, db_leave_type, balance_cur.rowcount)
+        else:
+            log.debug("Reserved %s days from %s (Escalated). Rows updated: %d", days, db_leave_type, balance_cur.rowcount)
         
-        conn.commit()
-        cur.close()
-        # Don't close pooled connection
-        print(f"✅ Leave Request Saved: {request_id} ({status})")
+        _balance_cache.discard((emp_id, db_leave_type))
+        
+        log.info("Leave request saved: %s (%s)", request_id, status)
         return request_id
         
     except Exception as e:
-        print(f"❌ Error saving leave request: {e}")
-        # Connection will be reused, don't close
+        log.warning("Error saving leave request: %s", e)
         return None
 
 
@@ -2000,16 +2717,20 @@ def save_leave_request(emp_id: str, leave_info: Dict, result: Dict) -> Optional[
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    conn = get_db_connection()
-    db_ok = conn is not None
-    # Don't close pooled connection
+    try:
+        with get_db_connection() as conn:
+            conn.execute("SELECT 1")
+        db_ok = True
+    except Exception:
+        db_ok = False
     
     return jsonify({
         "status": "healthy" if db_ok else "degraded",
         "service": "Constraint Satisfaction Engine",
         "version": "1.0",
         "database": "connected" if db_ok else "disconnected",
-        "total_rules": len(CONSTRAINT_RULES)
+        "total_rules": len(CONSTRAINT_RULES),
+        "rules_cache": cache_info()
     })
 
 
@@ -2028,11 +2749,7 @@ def analyze():
     if not text:
         return jsonify({"error": "text is required"}), 400
     
-    print(f"\n{'='*60}")
-    print(f"🔍 CONSTRAINT ENGINE - Analyzing Request")
-    print(f"{'='*60}")
-    print(f"Employee: {emp_id}")
-    print(f"Request: {text}")
+    log.debug("Analyzing request for %s: %s", emp_id, text)
     
     # Extract leave information from text
     leave_info = extract_leave_info(text)
@@ -2043,29 +2760,25 @@ def analyze():
     if is_half_day:
         leave_info['is_half_day'] = True
         leave_info['days_requested'] = 0.5
-        print(f"⚠️ HALF-DAY LEAVE DETECTED - Will require HR approval")
+        log.debug("Half-day leave detected - will require HR approval")
     
     # OVERRIDE with explicit values from request if provided (for integrity)
-    if data.get('start_date'):
-        leave_info['start_date'] = data.get('start_date')
-    if data.get('end_date'):
-        leave_info['end_date'] = data.get('end_date')
+    leave_info.update({key: data[key] for key in ('start_date', 'end_date') if data.get(key)})
+    # Reject malformed dates here rather than have each date rule fail open on them
+    for key in ('start_date', 'end_date'):
+        try:
+            parse_iso_datetime(leave_info[key])
+        except (TypeError, ValueError):
+            return jsonify({"error": f"{key} must be an ISO date"}), 400
     if data.get('total_days'):
-        leave_info['days_requested'] = int(data.get('total_days')) if not is_half_day else 0.5
-    if data.get('leave_type'):
-        # Map common types to our internal format
-        lt = data.get('leave_type', '').lower()
-        if 'casual' in lt or 'annual' in lt:
-            leave_info['leave_type'] = 'Annual Leave'
-        elif 'sick' in lt:
-            leave_info['leave_type'] = 'Sick Leave'
-        elif 'emergency' in lt:
-            leave_info['leave_type'] = 'Emergency Leave'
-        elif 'personal' in lt:
-            leave_info['leave_type'] = 'Personal Leave'
-    
-    print(f"Extracted: {leave_info['days_requested']} days of {leave_info['leave_type']}")
-    print(f"Dates: {leave_info['start_date']} to {leave_info['end_date']}")
+        leave_info['days_requested'] = int(data['total_days']) if not is_half_day else 0.5
+    # Map common types to our internal format; unknown types keep the one extracted from text
+    leave_type = data.get('leave_type') and normalize_leave_type(data['leave_type'])
+    if leave_type:
+        leave_info['leave_type'] = leave_type
+    
+    log.debug("Extracted: %s days of %s, %s to %s", leave_info['days_requested'], leave_info['leave_type'],
+              leave_info['start_date'], leave_info['end_date'])
     
     # Evaluate all constraints
     result = evaluate_all_constraints(emp_id, leave_info)
@@ -2076,15 +2789,19 @@ def analyze():
         result['priority'] = 'HIGH'
     
     # SAVE TO DATABASE
-    request_id = save_leave_request(emp_id, leave_info, result)
-    result['request_id'] = request_id
+    # Serialized once (as jsonify would) and stored as-is, request_id included
+    result['request_id'] = str(uuid.uuid4())
+    payload = dumps_json(result)
+    if save_leave_request(emp_id, leave_info, result, result['request_id'], payload) is None:
+        result['request_id'] = None
+        payload = dumps_json(result)
     
-    print(f"\n📊 Result: {'✅ APPROVED' if result['approved'] else '❌ ESCALATED'}")
-    print(f"Rules: {result['constraint_results']['passed']}/{result['constraint_results']['total_rules']} passed")
-    print(f"Time: {result['processing_time_ms']}ms")
-    print(f"{'='*60}\n")
+    log.info("Analyzed request for %s: %s, %d/%d rules passed in %sms", emp_id,
+             "APPROVED" if result['approved'] else "ESCALATED",
+             result['constraint_results']['passed'], result['constraint_results']['total_rules'],
+             result['processing_time_ms'])
     
-    return jsonify(result)
+    return app.response_class(f"{payload}\n", mimetype=app.json.mimetype)
 
 
 @app.route('/', methods=['GET'])
@@ -2144,15 +2861,27 @@ def get_org_rules(org_id: str):
 
 @app.route('/cache/clear', methods=['POST'])
 def clear_cache():
-    """Clear the rules cache (useful after HR updates rules)"""
+    """
+    Clear the rules cache (useful after HR updates rules).
+    Pass employee_id alone to drop just that employee's cached row and balances.
+    """
     data = request.json or {}
     org_id = data.get('org_id')
+    emp_id = data.get('employee_id')
     
-    clear_org_rules_cache(org_id)
+    if emp_id:
+        invalidate_employee(emp_id)
+    if org_id or not emp_id:
+        clear_org_rules_cache(org_id)
+    if not (org_id or emp_id):
+        # Blackout periods, employees and balances are not org-scoped; refresh them with a full clear
+        clear_blackout_dates_cache()
+        _employee_cache.clear()
+        _balance_cache.clear()
     
     return jsonify({
         "success": True,
-        "message": f"Cache cleared for: {org_id or 'all organizations'}"
+        "message": f"Cache cleared for: {' and '.join(filter(None, (org_id, emp_id))) or 'all organizations'}"
     })
 
 
@@ -2168,13 +2897,13 @@ def validate_quick():
     rules = get_org_constraint_rules(org_id) if org_id else DEFAULT_CONSTRAINT_RULES
     
     # Get config from rules
-    rule001 = rules.get("RULE001", {})
-    rule006 = rules.get("RULE006", {})
-    rule007 = rules.get("RULE007", {})
+    rule001 = rules.get("RULE001", _MISSING_RULE)
+    rule006 = rules.get("RULE006", _MISSING_RULE)
+    rule007 = rules.get("RULE007", _MISSING_RULE)
     
-    config001 = rule001.get("config", rule001)
-    config006 = rule006.get("config", rule006)
-    config007 = rule007.get("config", rule007)
+    config001 = rule001["config"]
+    config006 = rule006["config"]
+    config007 = rule007["config"]
     
     limits = config001.get("limits", {})
     notice_days = config006.get("notice_days", {})
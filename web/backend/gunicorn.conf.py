@@ -0,0 +1,19 @@
+"""
+Gunicorn settings for the constraint engine.
+Picked up automatically from the working directory, so the Procfile, Dockerfile,
+nixpacks and Render start commands only need to name the app and port.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8001')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", "2"))
+
+# Requests mostly wait on Postgres, so each worker serves several at once on threads.
+# Keep threads <= DB_POOL_MAX_SIZE (10) so a busy worker never queues on the pool.
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+keepalive = 5
+
+# No preload_app: importing constraint_engine opens the DB pool and starts the rules
+# cache warm-up and LISTEN threads, none of which survive a fork - each worker imports it.
+preload_app = False
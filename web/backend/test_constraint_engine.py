@@ -0,0 +1,383 @@
+"""
+Unit tests for the constraint engine's helpers, rules cache and request checks.
+Targeted cases (week boundaries, year end, odd input) plus a small check of each
+optimized function against the loop it replaced. No database or running server needed:
+
+    pip install pytest
+    python -m pytest test_constraint_engine.py
+"""
+
+import os
+from datetime import date, timedelta
+
+# Importing the engine must not start the rules cache warm-up or LISTEN threads
+os.environ.setdefault("RULES_CACHE_WARM", "false")
+os.environ.setdefault("RULES_CACHE_LISTEN", "false")
+
+import pytest
+
+import constraint_engine as ce
+
+# One week from a Monday: a start date on every weekday
+WEEK = [date(2025, 12, 1) + timedelta(days=i) for i in range(7)]
+
+
+# ============================================================
+# REFERENCE IMPLEMENTATIONS (the loops the engine used to run)
+# ============================================================
+
+def reference_business_days(start: date, end: date) -> int:
+    """Count weekdays from start to end inclusive, one day at a time"""
+    business_days = 0
+    current = start
+    while current <= end:
+        if current.weekday() < 5:
+            business_days += 1
+        current += timedelta(days=1)
+    return business_days
+
+
+def reference_add_business_days(start: date, business_days: int) -> date:
+    """Step forward one calendar day at a time until enough weekdays were added"""
+    end = start
+    added = 0
+    while added < business_days:
+        end += timedelta(days=1)
+        if end.weekday() < 5:
+            added += 1
+    return end
+
+
+def reference_blocked_weekdays(blocked_days) -> set:
+    """Weekdays (Monday = 0) the old walk blocked: full strftime("%A") names, any case"""
+    names = [d.lower() for d in blocked_days]
+    return {day.weekday() for day in WEEK if day.strftime("%A").lower() in names}
+
+
+def reference_custom_blackout(config: dict, leave_info: dict) -> tuple:
+    """The old day-by-day walk: exact ISO strings in blocked_dates, full strftime("%A") names in blocked_days"""
+    start_date = leave_info.get("start_date", "")
+    end_date = leave_info.get("end_date", "")
+    if not start_date:
+        return True, None, {}
+    blocked_dates = config.get("blocked_dates", [])
+    blocked_days = config.get("blocked_days", [])
+    current = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date) if end_date else current
+    while current <= end:
+        date_str = current.isoformat()
+        if date_str in blocked_dates:
+            return False, f"❌ R: {date_str} is blocked", {"blocked_date": date_str}
+        day_name = current.strftime("%A").lower()
+        if day_name in [d.lower() for d in blocked_days]:
+            return False, f"❌ R: {day_name.title()} is not allowed", {"blocked_day": day_name}
+        current += timedelta(days=1)
+    return True, None, {}
+
+
+def reference_leave_type(value: str):
+    """The if-chain /analyze used to map an explicit leave_type; None when nothing matches"""
+    lt = value.lower()
+    if 'casual' in lt or 'annual' in lt:
+        return 'Annual Leave'
+    elif 'sick' in lt:
+        return 'Sick Leave'
+    elif 'emergency' in lt:
+        return 'Emergency Leave'
+    elif 'personal' in lt:
+        return 'Personal Leave'
+    return None
+
+
+# ============================================================
+# BUSINESS DAYS
+# ============================================================
+
+@pytest.mark.parametrize("start, end, expected", [
+    ("2026-01-05", "2026-01-05", 1),   # Monday alone
+    ("2026-01-10", "2026-01-10", 0),   # Saturday alone
+    ("2026-01-10", "2026-01-11", 0),   # weekend
+    ("2026-01-09", "2026-01-12", 2),   # Friday to Monday
+    ("2026-01-05", "2026-01-09", 5),   # Monday to Friday
+    ("2026-01-05", "2026-01-11", 5),   # Monday to Sunday
+    ("2026-01-07", "2026-01-13", 5),   # Wednesday to Tuesday across a weekend
+    ("2026-01-11", "2026-01-24", 10),  # Sunday to Saturday, two weeks
+    ("2025-12-29", "2026-01-02", 5),   # year end
+    ("2026-12-31", "2027-01-04", 3),
+    ("2028-02-25", "2028-03-01", 4),   # leap day on a Tuesday
+    ("2026-03-10", "2026-03-09", 0),   # reversed range
+])
+def test_calculate_business_days(start, end, expected):
+    assert ce.calculate_business_days(start, end) == expected
+
+
+def test_calculate_business_days_matches_loop():
+    for start in WEEK:
+        for span in range(22):
+            end = start + timedelta(days=span)
+            assert ce.calculate_business_days(start.isoformat(), end.isoformat()) == \
+                reference_business_days(start, end), (start, end)
+
+
+@pytest.mark.parametrize("start, business_days, expected", [
+    (date(2026, 1, 5), 0, date(2026, 1, 5)),    # Monday + 0
+    (date(2026, 1, 10), 0, date(2026, 1, 10)),  # Saturday + 0 stays put
+    (date(2026, 1, 9), 1, date(2026, 1, 12)),   # Friday + 1 is Monday
+    (date(2026, 1, 10), 1, date(2026, 1, 12)),  # Saturday + 1 is Monday
+    (date(2026, 1, 5), 5, date(2026, 1, 12)),   # a full week
+    (date(2025, 12, 31), 2, date(2026, 1, 2)),  # year end
+    (date(2026, 12, 31), 2, date(2027, 1, 4)),
+])
+def test_add_business_days(start, business_days, expected):
+    assert ce.add_business_days(start, business_days) == expected
+
+
+def test_add_business_days_matches_loop():
+    for start in WEEK:
+        for business_days in range(15):
+            assert ce.add_business_days(start, business_days) == \
+                reference_add_business_days(start, business_days), (start, business_days)
+
+
+# ============================================================
+# ORG RULES CACHE
+# ============================================================
+
+def test_default_bundle_shares_default_rules():
+    assert ce.DEFAULT_RULES_BUNDLE.by_id is ce.DEFAULT_CONSTRAINT_RULES
+
+
+def test_org_without_policy_gets_default_bundle(monkeypatch):
+    monkeypatch.setattr(ce, "_fetch_org_policy", lambda org_id: None)
+    ce.clear_org_rules_cache("ORG-PLAIN")
+    try:
+        assert ce.get_org_rules_bundle("ORG-PLAIN") is ce.DEFAULT_RULES_BUNDLE
+        assert ce.get_org_constraint_rules("ORG-PLAIN") is ce.DEFAULT_CONSTRAINT_RULES
+    finally:
+        ce.clear_org_rules_cache("ORG-PLAIN")
+
+
+@pytest.mark.parametrize("rule_id, rule_data", [
+    ("RULE001", {}),
+    ("RULE001", {"config": {"limits": {"Annual Leave": 10}}}),
+    ("RULE001", {"config": None}),
+    ("RULE003", {"min_coverage_percent": 50}),
+    ("CUSTOM_1", {"name": "No Fridays", "category": "blackout"}),
+    ("CUSTOM_1", {"config": ["friday"]}),
+])
+def test_normalized_rules_always_carry_a_config_mapping(rule_id, rule_data):
+    rule = ce.normalize_rule_format(rule_id, rule_data)
+    assert isinstance(rule["config"], ce.Mapping)
+    if isinstance(rule_data.get("config"), dict):
+        assert rule["config"] == rule_data["config"]
+
+
+def test_failed_org_rules_load_is_cached_briefly(monkeypatch):
+    calls = []
+    
+    def failing_fetch(org_id):
+        calls.append(org_id)
+        raise ConnectionError("database unavailable")
+    
+    monkeypatch.setattr(ce, "_fetch_org_policy", failing_fetch)
+    ce.clear_org_rules_cache("ORG-DOWN")
+    try:
+        assert ce.get_org_rules_bundle("ORG-DOWN") is ce.DEFAULT_RULES_BUNDLE
+        assert ce.get_org_rules_bundle("ORG-DOWN") is ce.DEFAULT_RULES_BUNDLE
+        assert calls == ["ORG-DOWN"]
+        assert "ORG-DOWN" not in ce._org_rules_locks
+        # Retried once the short TTL runs out
+        expires_at, _ = ce._org_rules_cache["ORG-DOWN"]
+        monkeypatch.setattr(ce.time, "monotonic", lambda: expires_at)
+        ce.get_org_rules_bundle("ORG-DOWN")
+        assert calls == ["ORG-DOWN", "ORG-DOWN"]
+    finally:
+        ce.clear_org_rules_cache("ORG-DOWN")
+
+
+# ============================================================
+# CUSTOM BLACKOUT RULES
+# ============================================================
+
+def weekdays_in_mask(mask: int) -> set:
+    return {weekday for weekday in range(7) if mask >> weekday & 1}
+
+
+@pytest.mark.parametrize("blocked_days", [
+    [], ["Friday"], ["friday", "SATURDAY"], ["sunday", "monday"], list(ce._WEEKDAY_NAMES),
+    ["weekend", ""], ["Friday", "friday"],
+])
+def test_blocked_weekday_mask_matches_day_names(blocked_days):
+    assert weekdays_in_mask(ce._blocked_weekday_mask(blocked_days)) == reference_blocked_weekdays(blocked_days)
+
+
+def test_blocked_weekday_mask_matches_every_set_of_full_names():
+    for bits in range(128):
+        # Mixed case, as stored configs have it
+        blocked_days = [name.title() if weekday % 2 else name
+                        for weekday, name in enumerate(ce._WEEKDAY_NAMES) if bits >> weekday & 1]
+        assert weekdays_in_mask(ce._blocked_weekday_mask(blocked_days)) == \
+            reference_blocked_weekdays(blocked_days), blocked_days
+
+
+@pytest.mark.parametrize("blocked_days, weekdays", [
+    (["fri"], {4}),
+    (["FRI", "Sat"], {4, 5}),
+    (["mon", "sunday"], {0, 6}),
+    # Only the three-letter forms are short names
+    (["tues", "thurs", "fr"], set()),
+])
+def test_blocked_weekday_mask_accepts_short_names(blocked_days, weekdays):
+    # Not matched by the old walk; the mask also takes the abbreviations the engine parses elsewhere
+    assert weekdays_in_mask(ce._blocked_weekday_mask(blocked_days)) == weekdays
+
+
+def assert_blackout_matches_day_walk(config: dict, leave_info: dict) -> None:
+    """Check the handler directly, and through the compiled rule that binds the parsed dates and weekday mask"""
+    expected_passed, expected_message, expected_details = reference_custom_blackout(config, leave_info)
+    details = {}
+    assert ce._custom_blackout("R", config, "EMP1", leave_info, details) == (expected_passed, expected_message)
+    assert details == expected_details
+    result = ce.compile_custom_rule("R", {"name": "R", "category": "blackout", "config": config})("EMP1", leave_info)
+    assert result["passed"] is expected_passed
+    assert result["details"] == expected_details
+
+
+@pytest.mark.parametrize("config, start, end", [
+    ({}, "2026-01-09", "2026-01-09"),
+    ({"blocked_days": ["Friday"]}, "2026-01-09", "2026-01-09"),
+    ({"blocked_days": ["friday"]}, "2026-01-10", "2026-01-15"),
+    # Range crossing a week boundary
+    ({"blocked_days": ["monday"]}, "2026-01-09", "2026-01-12"),
+    ({"blocked_days": ["SUNDAY", "saturday"]}, "2026-01-09", "2026-01-12"),
+    # Year end
+    ({"blocked_dates": ["2026-01-01"]}, "2025-12-29", "2026-01-02"),
+    ({"blocked_dates": ["2025-12-31", "2026-01-01"], "blocked_days": ["thursday"]}, "2026-01-01", "2026-01-05"),
+    # Blocked date and weekday on the same day - the date is reported
+    ({"blocked_dates": ["2026-01-09"], "blocked_days": ["friday"]}, "2026-01-08", "2026-01-12"),
+    # A blocked weekday before a blocked date
+    ({"blocked_dates": ["2026-01-12"], "blocked_days": ["friday"]}, "2026-01-08", "2026-01-12"),
+    # No end date - just the start day
+    ({"blocked_days": ["friday"]}, "2026-01-09", ""),
+    ({"blocked_days": ["friday"]}, "", ""),
+    # Strings that are not exact ISO dates never match
+    ({"blocked_dates": ["2026-1-9", "2026/01/09", "not a date", "2026-01-09T00:00"]}, "2026-01-05", "2026-01-16"),
+    # Unknown and empty day names
+    ({"blocked_days": ["weekend", ""]}, "2026-01-05", "2026-01-18"),
+])
+def test_custom_blackout_matches_day_walk(config, start, end):
+    assert_blackout_matches_day_walk(config, {"start_date": start, "end_date": end})
+
+
+def test_custom_blackout_single_weekday_over_two_weeks():
+    for start in WEEK:
+        for span in range(14):
+            for name in ce._WEEKDAY_NAMES:
+                assert_blackout_matches_day_walk({"blocked_days": [name]}, {
+                    "start_date": start.isoformat(), "end_date": (start + timedelta(days=span)).isoformat()})
+
+
+# ============================================================
+# CUSTOM RULE CONFIG VALIDATION
+# ============================================================
+
+FRIDAY_LEAVE = {"leave_type": "Annual Leave", "start_date": "2030-01-11", "end_date": "2030-01-11",
+                "days_requested": 1}
+
+
+@pytest.mark.parametrize("category, config, problem", [
+    ("limits", {"max_days": "5"}, "max_days must be a number"),
+    ("limits", {"min_days": True}, "min_days must be a number"),
+    ("notice", {"min_notice_days": [3]}, "min_notice_days must be a number"),
+    ("blackout", {"blocked_dates": "2030-01-11"}, "blocked_dates must be a list"),
+    ("blackout", {"blocked_days": [4]}, "blocked_days must contain day names"),
+    ("eligibility", {"allowed_departments": "Sales"}, "allowed_departments must be a list"),
+    ("escalation", {"applies_to_types": "Annual Leave"}, "applies_to_types must be a list"),
+    ("limits", {"condition": "greater_than", "threshold": "3"}, "threshold must be a number"),
+    ("limits", [], "config must be an object"),
+])
+def test_validate_custom_rule_config_rejects(category, config, problem):
+    assert ce.validate_custom_rule_config(config, category) == problem
+
+
+@pytest.mark.parametrize("category, config", [
+    ("limits", {}),
+    ("limits", {"max_days": 5, "min_days": 0.5, "excluded_types": ["Sick Leave"]}),
+    ("notice", {"min_notice_days": None}),
+    ("blackout", {"blocked_days": ("fri", "Saturday"), "blocked_dates": []}),
+    # Keys another category would read are ignored
+    ("blackout", {"blocked_days": ["friday"], "max_days": "5"}),
+    ("notice", {"blocked_days": "friday", "min_notice_days": 2}),
+    # threshold is only compared under a known condition
+    ("limits", {"condition": "unknown", "threshold": "3"}),
+])
+def test_validate_custom_rule_config_accepts(category, config):
+    assert ce.validate_custom_rule_config(config, category) is None
+
+
+def test_unrelated_bad_key_does_not_disable_rule():
+    rule = {"name": "R", "category": "blackout", "config": {"blocked_days": ["friday"], "max_days": "5"}}
+    result = ce.compile_custom_rule("R", rule)("EMP1", FRIDAY_LEAVE)
+    assert result["passed"] is False
+    assert result["details"] == {"blocked_day": "friday"}
+
+
+def test_invalid_config_disables_rule():
+    rule = {"name": "R", "category": "blackout", "config": {"blocked_days": "friday"}}
+    result = ce.compile_custom_rule("R", rule)("EMP1", FRIDAY_LEAVE)
+    assert result["passed"] is True
+    assert "error" in result["details"]
+
+
+# ============================================================
+# DATE INPUT
+# ============================================================
+
+@pytest.mark.parametrize("start, end", [("2030-01-10", "2030-01-12"), ("2030-01-10T09:00:00", "2030-01-12T18:00:00")])
+def test_blackout_dates_accept_date_and_datetime_input(monkeypatch, start, end):
+    row = {"id": 1, "start_date": "2030-01-11", "end_date": "2030-01-11"}
+    monkeypatch.setattr(ce, "_fetch_blackout_dates", lambda: [row])
+    ce.clear_blackout_dates_cache()
+    try:
+        assert ce.get_blackout_dates(start, end) == [row]
+    finally:
+        ce.clear_blackout_dates_cache()
+
+
+@pytest.mark.parametrize("field, value", [("start_date", "2030-13-01"), ("end_date", "next friday")])
+def test_analyze_rejects_malformed_dates(field, value):
+    response = ce.app.test_client().post("/analyze", json={
+        "employee_id": "EMP1", "text": "annual leave for 2 days", field: value})
+    assert response.status_code == 400
+    assert response.get_json() == {"error": f"{field} must be an ISO date"}
+
+
+# ============================================================
+# LEAVE TYPE MAPPING
+# ============================================================
+
+@pytest.mark.parametrize("value, expected", [
+    ("casual", "Annual Leave"),
+    ("annual leave", "Annual Leave"),
+    ("Sick Leave", "Sick Leave"),
+    ("EMERGENCY", "Emergency Leave"),
+    ("personal day", "Personal Leave"),
+    # Keywords are checked in the old if-chain order, so the first branch wins
+    ("sick/annual", "Annual Leave"),
+    ("personal-casual", "Annual Leave"),
+    ("Emergency sick leave", "Sick Leave"),
+    ("personal emergency", "Emergency Leave"),
+    ("maternity", None),
+    ("vacation", None),
+    ("", None),
+])
+def test_normalize_leave_type(value, expected):
+    assert ce.normalize_leave_type(value) == expected
+
+
+def test_normalize_leave_type_matches_if_chain():
+    keywords = ["casual", "Annual", "SICK", "emergency", "Personal", "leave"]
+    for first in keywords:
+        for second in keywords:
+            value = f"{first} {second}"
+            assert ce.normalize_leave_type(value) == reference_leave_type(value), value
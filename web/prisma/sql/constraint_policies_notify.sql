@@ -0,0 +1,22 @@
+-- Rules cache invalidation for the constraint engine (web/backend/constraint_engine.py).
+-- Every write to constraint_policies sends {"org_id": ...} on the constraint_policies_changed
+-- channel; each engine worker LISTENs and drops only that org's cached rules.
+--
+-- `prisma db push` does not create triggers, so apply this once per database after pushing
+-- the schema (as the table owner):  npm run prisma:triggers
+-- Safe to re-run.
+
+CREATE OR REPLACE FUNCTION notify_constraint_policies_changed() RETURNS trigger AS $$
+BEGIN
+    PERFORM pg_notify(
+        'constraint_policies_changed',
+        json_build_object('org_id', CASE WHEN TG_OP = 'DELETE' THEN OLD.org_id ELSE NEW.org_id END)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS constraint_policies_changed ON constraint_policies;
+CREATE TRIGGER constraint_policies_changed
+    AFTER INSERT OR UPDATE OR DELETE ON constraint_policies
+    FOR EACH ROW EXECUTE FUNCTION notify_constraint_policies_changed();